@@ -0,0 +1,52 @@
+import logging
+from typing import Callable, Dict, List
+
+from .models import Achievement
+
+logger = logging.getLogger(__name__)
+
+# Each condition reads one counter maintained on the user_progress document
+CONDITIONS: Dict[str, Callable[[dict], int]] = {
+    "discover_plants": lambda progress: progress.get("plants_collected", 0),
+    "discover_rare_plants": lambda progress: progress.get("rarity_counts", {}).get("Rare", 0),
+    "complete_trails": lambda progress: len(progress.get("completed_trails", [])),
+}
+
+
+class AchievementEngine:
+    """Evaluates achievement conditions against per-session progress counters.
+
+    Rules are compiled once per achievement catalog, so checking a session
+    after a discovery costs O(1) per achievement regardless of how many
+    discoveries the session has made.
+    """
+
+    def __init__(self):
+        self._source = None
+        self._rules = []
+
+    def _compile(self, achievements: List[dict]):
+        # The catalog cache hands out the same list until it is reloaded
+        if achievements is self._source:
+            return self._rules
+
+        rules = []
+        for achievement_data in achievements:
+            achievement = Achievement(**achievement_data)
+            counter = CONDITIONS.get(achievement.condition)
+            if counter is None:
+                logger.warning(f"Unknown achievement condition {achievement.condition!r} on {achievement.id}")
+                continue
+            rules.append((achievement, counter))
+
+        self._source, self._rules = achievements, rules
+        return rules
+
+    def evaluate(self, achievements: List[dict], progress: dict) -> List[Achievement]:
+        """Return achievements whose condition is met but which are not unlocked yet"""
+        unlocked = set(progress.get("achievements_unlocked", []))
+        return [
+            achievement
+            for achievement, counter in self._compile(achievements)
+            if achievement.id not in unlocked and counter(progress) >= achievement.condition_value
+        ]
@@ -0,0 +1,174 @@
+import json
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from . import metrics
+
+# (tokens per second, burst) per route class; each can be overridden with
+# RATE_LIMIT_<CLASS>="<rate>,<burst>", and a rate of 0 turns the class off
+DEFAULT_LIMITS: Dict[str, Tuple[float, float]] = {
+    "sessions": (0.2, 5),
+    # Ceiling per client address, loose enough for a school group or a
+    # carrier NAT sharing one address
+    "session_addresses": (1.0, 100),
+    "discoveries": (2.0, 20),
+    "writes": (5.0, 20),
+}
+
+RouteClasses = Tuple[Tuple[str, Optional[str]], ...]
+
+# Rate limited routes, as (class, query parameter identifying the caller)
+# pairs that must all admit the request; a parameter of None keys on the
+# client address. Other writes fall into "writes", reads are only subject to
+# the concurrency limit
+ROUTE_CLASSES: Dict[Tuple[str, str], RouteClasses] = {
+    ("POST", "/api/sessions"): (("session_addresses", None), ("sessions", "device_id")),
+    ("POST", "/api/discoveries"): (("discoveries", "session_id"),),
+    ("POST", "/api/discoveries/batch"): (("discoveries", "session_id"),),
+}
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+# Writes that carry their session id as the path segment after the prefix
+SESSION_PATHS = ("/api/settings/",)
+
+# Long-lived streams and probes never count against the concurrency limit
+EXEMPT_PREFIXES = ("/api/events/", "/api/health", "/metrics")
+
+
+class TokenBuckets:
+    """Token buckets per key, refilled lazily when a key is used.
+
+    At most ``max_keys`` buckets are kept; the least recently used one is
+    dropped first, which only ever makes a client's bucket full again.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 100000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, now: Optional[float] = None) -> float:
+        """Take a token for ``key``: 0 if allowed, otherwise seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.burst, now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def limits_from_env(environ: Mapping[str, str] = os.environ) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for name, (rate, burst) in DEFAULT_LIMITS.items():
+        value = environ.get(f"RATE_LIMIT_{name.upper()}")
+        if value:
+            rate_text, _, burst_text = value.partition(",")
+            rate, burst = float(rate_text), float(burst_text or burst)
+        if rate > 0:
+            limits[name] = (rate, burst)
+    return limits
+
+
+def route_class(method: str, path: str) -> RouteClasses:
+    """Rate limit classes of a request and the query parameters keying them"""
+    known = ROUTE_CLASSES.get((method, path.rstrip("/")))
+    if known:
+        return known
+    if method in WRITE_METHODS:
+        return (("writes", "session_id"),)
+    return ()
+
+
+def path_session(path: str) -> Optional[str]:
+    for prefix in SESSION_PATHS:
+        if path.startswith(prefix):
+            return path[len(prefix):].split("/", 1)[0] or None
+    return None
+
+
+def client_key(scope, param: Optional[str]) -> str:
+    if param:
+        for name, value in parse_qsl(scope.get("query_string", b"").decode("latin-1")):
+            if name == param and value:
+                return f"{param}:{value}"
+        session_id = path_session(scope["path"]) if param == "session_id" else None
+        if session_id:
+            return f"session_id:{session_id}"
+    # Falls back to the peer address (set from X-Forwarded-For by uvicorn --proxy-headers)
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+async def reject(send, status: int, retry_after: float, detail: str):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that rejects requests with 429 before they reach Mongo.
+
+    Writes are rate limited per device, session or client address and route
+    class with token buckets, and the number of requests in flight is capped at
+    ``max_concurrent`` (0 disables the cap) so excess load is shed instead of
+    queueing for a database connection. ``limits`` defaults to
+    ``DEFAULT_LIMITS`` with the RATE_LIMIT_* environment overrides applied.
+    """
+
+    def __init__(self, app, max_concurrent: int = 100, limits: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.app = app
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        limits = limits_from_env() if limits is None else limits
+        self.buckets = {name: TokenBuckets(rate, burst) for name, (rate, burst) in limits.items()}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        for name, param in route_class(scope["method"], scope["path"]):
+            buckets = self.buckets.get(name)
+            if buckets is None:
+                continue
+            retry_after = buckets.take(client_key(scope, param))
+            if retry_after:
+                metrics.admission_rejections.inc(name)
+                await reject(send, 429, retry_after, "Too many requests")
+                return
+
+        if self.max_concurrent and self.in_flight >= self.max_concurrent:
+            metrics.admission_rejections.inc("overloaded")
+            await reject(send, 429, 1, "Server busy, try again shortly")
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+# Hourly discovery counts per checkpoint, the only thing /analytics/* reads
+ROLLUP_COLUMNS = ["checkpoint_id", "plant_id", "trail_id", "hour", "count"]
+STATE_ID = "discovery_rollups"
+
+CHUNK_SIZE = 5000
+# Discoveries newer than this are left for the next run, since ObjectIds are
+# generated by each worker's driver and may arrive slightly out of order
+SETTLE_DELAY = timedelta(seconds=10)
+# How long a worker may hold the rollup before another one can take over
+LEASE = timedelta(minutes=5)
+
+
+async def _acquire(db, now: datetime) -> Tuple[bool, Optional[ObjectId]]:
+    """Take the rollup lease so only one worker processes new events at a time.
+
+    Returns whether the lease was taken and the last processed ``_id``.
+    """
+    try:
+        state = await db.analytics_state.find_one_and_update(
+            {"_id": STATE_ID, "$or": [{"locked_until": {"$lt": now}}, {"locked_until": {"$exists": False}}]},
+            {"$set": {"locked_until": now + LEASE}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # The state document exists and is locked by another worker
+        return False, None
+    return True, (state or {}).get("last_id")
+
+
+async def rollup_discoveries(db, checkpoint_trails: Dict[str, str], chunk_size: int = CHUNK_SIZE) -> int:
+    """Fold user_discoveries inserted since the last run into discovery_rollups.
+
+    Events are read in ``_id`` order in chunks of ``chunk_size``, counted per
+    checkpoint and hour with pandas and applied as ``$inc`` upserts. The last
+    processed ``_id`` is stored after every chunk so each run only reads new
+    events. Returns the number of discoveries processed.
+    """
+    now = datetime.utcnow()
+    acquired, last_id = await _acquire(db, now)
+    if not acquired:
+        return 0
+    cutoff = ObjectId.from_datetime(now - SETTLE_DELAY)
+
+    processed = 0
+    try:
+        while True:
+            id_range = {"$lt": cutoff}
+            if last_id is not None:
+                id_range["$gt"] = last_id
+            rows = await db.user_discoveries.find(
+                {"_id": id_range},
+                {"_id": 1, "checkpoint_id": 1, "plant_id": 1, "discovered_at": 1}
+            ).sort("_id", 1).limit(chunk_size).to_list(chunk_size)
+            if not rows:
+                break
+
+            frame = pd.DataFrame(rows)
+            frame["hour"] = pd.to_datetime(frame["discovered_at"]).dt.floor("h")
+            counts = frame.groupby(["checkpoint_id", "plant_id", "hour"]).size()
+            await db.discovery_rollups.bulk_write([
+                UpdateOne(
+                    {"checkpoint_id": checkpoint_id, "hour": hour.to_pydatetime()},
+                    {
+                        "$inc": {"count": int(count)},
+                        "$setOnInsert": {"plant_id": plant_id, "trail_id": checkpoint_trails.get(checkpoint_id)}
+                    },
+                    upsert=True
+                )
+                for (checkpoint_id, plant_id, hour), count in counts.items()
+            ], ordered=False)
+
+            last_id = rows[-1]["_id"]
+            await db.analytics_state.update_one(
+                {"_id": STATE_ID},
+                {"$set": {"last_id": last_id, "updated_at": datetime.utcnow()}}
+            )
+            processed += len(rows)
+            if len(rows) < chunk_size:
+                break
+    finally:
+        await db.analytics_state.update_one({"_id": STATE_ID}, {"$set": {"locked_until": datetime.utcnow()}})
+    return processed
+
+
+async def load_rollups(db, since: datetime, until: datetime) -> pd.DataFrame:
+    rows = await db.discovery_rollups.find(
+        {"hour": {"$gte": since, "$lt": until}},
+        {"_id": 0, **{column: 1 for column in ROLLUP_COLUMNS}}
+    ).to_list(None)
+    frame = pd.DataFrame(rows, columns=ROLLUP_COLUMNS)
+    frame["hour"] = pd.to_datetime(frame["hour"])
+    frame["count"] = frame["count"].astype(np.int64)
+    return frame
+
+
+def heatmaps(frame: pd.DataFrame, key: str) -> Dict[str, List[List[int]]]:
+    """Weekday (Monday first) x hour-of-day discovery counts for each value of ``key``"""
+    weekdays = frame["hour"].dt.weekday.to_numpy()
+    hours = frame["hour"].dt.hour.to_numpy()
+    counts = frame["count"].to_numpy()
+
+    result = {}
+    for value, positions in frame.groupby(key).indices.items():
+        grid = np.zeros((7, 24), dtype=np.int64)
+        np.add.at(grid, (weekdays[positions], hours[positions]), counts[positions])
+        result[value] = grid.tolist()
+    return result
+
+
+def timeseries(frame: pd.DataFrame, key: str, freq: str) -> Dict[str, List[Tuple[datetime, int]]]:
+    """Discovery counts per ``freq`` bucket ("h" or "D") for each value of ``key``"""
+    buckets = frame["hour"].dt.floor(freq)
+    totals = frame.groupby([frame[key], buckets])["count"].sum()
+
+    result: Dict[str, List[Tuple[datetime, int]]] = {}
+    for (value, at), count in totals.items():
+        result.setdefault(value, []).append((at.to_pydatetime(), int(count)))
+    return result
+
+
+def drop_offs(counts: np.ndarray) -> np.ndarray:
+    """Share of each step's count lost relative to the previous step, between 0 and 1.
+
+    Rollups hold totals rather than who discovered what, so this is a ratio of
+    counts; a step more popular than the one before it has no drop-off.
+    """
+    counts = counts.astype(np.float64)
+    previous = np.concatenate((counts[:1], counts[:-1]))
+    drop_off = np.divide(previous - counts, previous, out=np.zeros_like(counts), where=previous > 0)
+    return np.clip(drop_off, 0.0, 1.0)
+
+
+async def trail_funnel(db, trail_id: str, checkpoint_ids: List[str]) -> List[Tuple[str, int, float]]:
+    """(checkpoint_id, discoveries, drop-off from the previous checkpoint) in trail order"""
+    totals = {
+        row["_id"]: row["count"]
+        async for row in db.discovery_rollups.aggregate([
+            {"$match": {"trail_id": trail_id}},
+            {"$group": {"_id": "$checkpoint_id", "count": {"$sum": "$count"}}},
+        ])
+    }
+    counts = np.array([totals.get(checkpoint_id, 0) for checkpoint_id in checkpoint_ids], dtype=np.int64)
+    drop_off = drop_offs(counts)
+    return [
+        (checkpoint_id, int(count), float(drop))
+        for checkpoint_id, count, drop in zip(checkpoint_ids, counts, drop_off)
+    ]
@@ -0,0 +1,155 @@
+import asyncio
+import hashlib
+import os
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from gridfs.errors import NoFile
+from pydantic import BaseModel
+
+CHUNK_SIZE = 256 * 1024
+
+
+class BlobNotFound(Exception):
+    pass
+
+
+class StoredBlob(BaseModel):
+    blob_id: str
+    size: int
+    etag: str
+
+
+class BlobStore:
+    """Interface for storing large binary objects outside of Mongo documents"""
+
+    async def put(self, chunks: AsyncIterator[bytes], filename: str, content_type: str) -> StoredBlob:
+        raise NotImplementedError
+
+    def stream(self, blob_id: str, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Yield the bytes of a blob from ``start`` up to and including ``end``"""
+        raise NotImplementedError
+
+    async def delete(self, blob_id: str) -> None:
+        raise NotImplementedError
+
+    async def read(self, blob_id: str) -> bytes:
+        """Read a whole blob into memory"""
+        return b"".join([chunk async for chunk in self.stream(blob_id)])
+
+
+class GridFSBlobStore(BlobStore):
+    """Blob store backed by a GridFS bucket in the application database"""
+
+    def __init__(self, db, bucket_name: str = "blobs"):
+        self.bucket = AsyncIOMotorGridFSBucket(db, bucket_name=bucket_name, chunk_size_bytes=CHUNK_SIZE)
+
+    async def put(self, chunks, filename, content_type):
+        digest = hashlib.sha256()
+        size = 0
+        grid_in = self.bucket.open_upload_stream(filename, metadata={"content_type": content_type})
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                await grid_in.write(chunk)
+        except BaseException:
+            await grid_in.abort()
+            raise
+        await grid_in.close()
+        return StoredBlob(blob_id=str(grid_in._id), size=size, etag=digest.hexdigest())
+
+    async def stream(self, blob_id, start=0, end=None):
+        try:
+            grid_out = await self.bucket.open_download_stream(ObjectId(blob_id))
+        except (InvalidId, NoFile):
+            raise BlobNotFound(blob_id)
+
+        remaining = (grid_out.length if end is None else end + 1) - start
+        grid_out.seek(start)
+        while remaining > 0:
+            chunk = await grid_out.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+    async def delete(self, blob_id):
+        try:
+            await self.bucket.delete(ObjectId(blob_id))
+        except (InvalidId, NoFile):
+            pass
+
+
+class LocalBlobStore(BlobStore):
+    """Blob store that keeps each blob as a file under ``root``"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, blob_id: str) -> Path:
+        # Blob ids are generated by us; reject anything that could escape root
+        if not blob_id.isalnum():
+            raise BlobNotFound(blob_id)
+        return self.root / blob_id
+
+    async def put(self, chunks, filename, content_type):
+        blob_id = uuid.uuid4().hex
+        path = self._path(blob_id)
+        tmp_path = path.with_suffix(".part")
+        digest = hashlib.sha256()
+        size = 0
+
+        f = await asyncio.to_thread(open, tmp_path, "wb")
+        try:
+            async for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            f.close()
+            tmp_path.unlink(missing_ok=True)
+            raise
+        f.close()
+        await asyncio.to_thread(os.replace, tmp_path, path)
+        return StoredBlob(blob_id=blob_id, size=size, etag=digest.hexdigest())
+
+    async def stream(self, blob_id, start=0, end=None):
+        path = self._path(blob_id)
+        try:
+            f = await asyncio.to_thread(open, path, "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(blob_id)
+
+        try:
+            remaining = ((await asyncio.to_thread(os.path.getsize, path)) if end is None else end + 1) - start
+            f.seek(start)
+            while remaining > 0:
+                chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            f.close()
+
+    async def delete(self, blob_id):
+        try:
+            await asyncio.to_thread(self._path(blob_id).unlink, True)
+        except BlobNotFound:
+            pass
+
+
+def create_blob_store(db) -> BlobStore:
+    """Create the blob store selected by the BLOB_STORE environment variable"""
+    backend = os.environ.get("BLOB_STORE", "gridfs")
+    if backend == "gridfs":
+        return GridFSBlobStore(db)
+    if backend == "local":
+        return LocalBlobStore(Path(os.environ.get("BLOB_STORE_DIR", Path(__file__).parent / "blobs")))
+    raise ValueError(f"Unknown BLOB_STORE backend: {backend}")
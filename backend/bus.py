@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Optional[str], Optional[dict]], None]
+
+# Capped, so old messages are discarded by Mongo and the collection never grows
+COLLECTION_SIZE = 1024 * 1024
+
+
+class InvalidationBus:
+    """Cross-worker notifications over a capped Mongo collection.
+
+    ``publish`` is write-behind: messages are buffered and inserted together
+    every ``flush_interval`` seconds. Every worker tails the collection with a
+    tailable cursor and hands messages from other workers to the handlers
+    subscribed to their topic, so a write in one worker reaches the others
+    within roughly ``flush_interval + max_await`` seconds.
+
+    If the cursor is lost, messages may have been missed, so every handler is
+    called with ``key=None`` ("drop everything") before tailing resumes.
+    """
+
+    def __init__(self, db, name: str = "invalidations", flush_interval: float = 0.1, max_await: float = 1.0):
+        self.db = db
+        self.collection = db[name]
+        self.flush_interval = flush_interval
+        self.max_await = max_await
+        self.origin = uuid.uuid4().hex
+        self._handlers: Dict[str, List[Handler]] = defaultdict(list)
+        self._outbox: List[dict] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def subscribe(self, topic: str, handler: Handler):
+        self._handlers[topic].append(handler)
+
+    def publish(self, topic: str, key: Optional[str] = None, data: Optional[Dict[str, Any]] = None):
+        """Queue a message for the other workers; the local state is updated by the caller"""
+        self._outbox.append({
+            "topic": topic, "key": key, "data": data, "origin": self.origin, "at": datetime.utcnow()
+        })
+
+    async def flush(self):
+        if not self._outbox:
+            return
+        messages, self._outbox = self._outbox, []
+        try:
+            await self.collection.insert_many(messages, ordered=True)
+        except Exception:
+            logger.exception(f"Failed to publish {len(messages)} bus messages, will retry")
+            # Fresh ids on retry; a batch that was in fact written is delivered twice,
+            # which invalidation handlers tolerate
+            for message in messages:
+                message.pop("_id", None)
+            self._outbox[:0] = messages
+
+    def _dispatch(self, message: dict):
+        if message.get("origin") == self.origin:
+            return
+        for handler in self._handlers.get(message.get("topic"), ()):
+            try:
+                handler(message.get("key"), message.get("data"))
+            except Exception:
+                logger.exception(f"Bus handler for {message.get('topic')} failed")
+
+    def _resync(self):
+        for topic, handlers in self._handlers.items():
+            for handler in handlers:
+                try:
+                    handler(None, None)
+                except Exception:
+                    logger.exception(f"Bus handler for {topic} failed to resync")
+
+    async def _ensure_collection(self):
+        try:
+            await self.db.create_collection(self.collection.name, capped=True, size=COLLECTION_SIZE)
+        except CollectionInvalid:
+            pass
+        # A tailable cursor on an empty capped collection is closed immediately
+        await self.collection.insert_one({"topic": None, "origin": self.origin, "at": datetime.utcnow()})
+
+    async def _tail(self):
+        lost = False
+        while True:
+            try:
+                # Messages up to the newest one now in the collection predate this
+                # worker's state and are skipped
+                newest = await self.collection.find({}, {"_id": 1}).sort("$natural", -1).limit(1).to_list(1)
+                marker = newest[0]["_id"] if newest else None
+                cursor = self.collection.find(
+                    {}, cursor_type=CursorType.TAILABLE_AWAIT, max_await_time_ms=int(self.max_await * 1000)
+                )
+                if lost:
+                    self._resync()
+
+                while cursor.alive:
+                    async for message in cursor:
+                        if marker is not None:
+                            if message["_id"] == marker:
+                                marker = None
+                            continue
+                        self._dispatch(message)
+                    # Caught up; the marker may have been overwritten in the meantime
+                    marker = None
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Bus cursor failed, resyncing")
+            lost = True
+            await asyncio.sleep(self.max_await)
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._tasks:
+            return
+        await self._ensure_collection()
+        self._tasks = [asyncio.create_task(self._tail()), asyncio.create_task(self._flush_periodically())]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.flush()
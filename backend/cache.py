@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+class CatalogCache:
+    """Read-through in-process cache for rarely changing catalog data.
+
+    Entries expire after ``ttl`` seconds and can be dropped explicitly with
+    ``invalidate`` whenever the catalog is written to. A load that was in
+    flight when its key was invalidated is returned to its caller but not
+    stored, since it may predate the write.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, Tuple[float, Any]] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Bumped by invalidate(), per key and for everything at once
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+
+    def _generation(self, key: str) -> Tuple[int, int]:
+        return self._epoch, self._generations.get(key, 0)
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the cached value for ``key``, loading it on a miss"""
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        # Only one coroutine reloads a given key; the others wait for it
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            generation = self._generation(key)
+            value = await loader()
+            if self._generation(key) == generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    def invalidate(self, *keys: str) -> None:
+        """Drop the given keys, or everything when called without arguments"""
+        if not keys:
+            self._epoch += 1
+            self._entries.clear()
+            return
+        for key in keys:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+            "entries": len(self._entries),
+            "ttl": self.ttl,
+        }
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry when full.
+
+    A value read from the database on a miss is stored with ``reserve`` and
+    ``put_reserved``: any ``put``, ``pop`` or ``clear`` of the key in between
+    cancels the reservation, so a slow read never replaces a newer write.
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, Any]" = OrderedDict()
+        self._reservations: Dict[Any, object] = {}
+
+    def get(self, key: Any) -> Optional[Any]:
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        self._reservations.pop(key, None)
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def reserve(self, key: Any) -> object:
+        """Start a read of ``key``; pass the returned token to ``put_reserved``"""
+        token = self._reservations[key] = object()
+        return token
+
+    def put_reserved(self, key: Any, value: Any, token: object) -> bool:
+        """Store a value read since ``reserve`` unless the key was written in the meantime"""
+        if self._reservations.get(key) is not token:
+            return False
+        self.put(key, value)
+        return True
+
+    def pop(self, key: Any) -> None:
+        self._reservations.pop(key, None)
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._reservations.clear()
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._entries),
+            "maxsize": self.maxsize,
+        }
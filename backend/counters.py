@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+
+class CounterBuffer:
+    """Write-behind buffer for hot ``$inc`` counters.
+
+    Increments are accumulated in memory per document and written in a single
+    ``bulk_write`` every ``interval`` seconds and on shutdown, so a burst of
+    updates to the same document becomes one write.
+
+    With a ``refresh_interval``, the persisted counters are also re-read every
+    so often and kept up to date with this buffer's own flushes in between,
+    so ``total`` gives a current value without a query per read.
+    """
+
+    def __init__(self, collection, field: str, interval: float = 1.0, refresh_interval: Optional[float] = None):
+        self.collection = collection
+        self.field = field
+        self.interval = interval
+        self.refresh_interval = refresh_interval
+        self._buffer: Dict[str, int] = defaultdict(int)
+        self._flushing: Dict[str, int] = {}
+        self._totals: Dict[str, int] = {}
+        self._refreshed_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, key: str, amount: int = 1):
+        self._buffer[key] += amount
+
+    def pending(self, key: str) -> int:
+        """Increments for ``key`` that have not been persisted yet"""
+        return self._buffer.get(key, 0) + self._flushing.get(key, 0)
+
+    def total(self, key: str) -> Optional[int]:
+        """Current value of ``key``'s counter, or None if it has not been read yet"""
+        persisted = self._totals.get(key)
+        if persisted is None:
+            return None
+        return persisted + self.pending(key)
+
+    async def refresh(self):
+        """Re-read the persisted counters, picking up increments made by other workers"""
+        self._totals = {
+            doc["id"]: doc.get(self.field) or 0
+            async for doc in self.collection.find({}, {"_id": 0, "id": 1, self.field: 1})
+        }
+        self._refreshed_at = time.monotonic()
+
+    async def flush(self):
+        if not self._buffer or self._flushing:
+            return
+
+        # Swap the buffer out so increments arriving during the write are kept
+        self._flushing, self._buffer = self._buffer, defaultdict(int)
+        try:
+            await self.collection.bulk_write(
+                [UpdateOne({"id": key}, {"$inc": {self.field: amount}}) for key, amount in self._flushing.items()],
+                ordered=False
+            )
+            for key, amount in self._flushing.items():
+                if key in self._totals:
+                    self._totals[key] += amount
+        except Exception:
+            logger.exception(f"Failed to flush {self.field} increments, will retry")
+            for key, amount in self._flushing.items():
+                self._buffer[key] += amount
+        finally:
+            self._flushing = {}
+
+    def _refresh_due(self) -> bool:
+        if not self.refresh_interval:
+            return False
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval
+
+    async def _run(self):
+        # Refreshes only run between flushes, so a read never races this
+        # buffer's own writes and counts them twice
+        while True:
+            if self._refresh_due():
+                try:
+                    await self.refresh()
+                except Exception:
+                    logger.exception(f"Failed to refresh {self.field} totals")
+                    self._refreshed_at = time.monotonic()
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per connection before it is considered stuck and dropped
+QUEUE_SIZE = 100
+HEARTBEAT_INTERVAL = 15.0
+
+
+class EventHub:
+    """In-process pub/sub of per-session events.
+
+    Every open connection of a session gets its own bounded queue; publishing
+    never blocks, and a connection that stops reading is closed instead of
+    letting its queue grow.
+    """
+
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue(self.queue_size)
+        self._subscribers[session_id].add(queue)
+        return queue
+
+    def unsubscribe(self, session_id: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(session_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[session_id]
+
+    def publish(self, session_id: str, event: str, data: Dict[str, Any]):
+        for queue in list(self._subscribers.get(session_id, ())):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping slow event subscriber for session {session_id}")
+                self.unsubscribe(session_id, queue)
+                # Wakes the stream up so it can close
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+    def connections(self) -> int:
+        return sum(len(queues) for queues in self._subscribers.values())
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {orjson.dumps(data).decode()}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(
+    hub: EventHub,
+    session_id: str,
+    is_disconnected,
+    heartbeat: float = HEARTBEAT_INTERVAL
+) -> AsyncIterator[str]:
+    """Server-Sent Events for one session until the client goes away"""
+    queue = hub.subscribe(session_id)
+    event_id = 0
+    try:
+        # Tells EventSource how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                # Comment line that keeps proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+                continue
+            if message is None:
+                break
+            event_id += 1
+            yield format_sse(*message, event_id=event_id)
+    finally:
+        hub.unsubscribe(session_id, queue)
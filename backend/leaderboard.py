@@ -0,0 +1,124 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sortedcontainers import SortedList
+
+from .models import LeaderboardWindow
+
+
+def player_tag(session_id: str) -> str:
+    """Public identifier for a session; session ids themselves are never exposed"""
+    return hashlib.sha256(session_id.encode()).hexdigest()[:10]
+
+
+def window_start(window: LeaderboardWindow, now: datetime) -> Optional[datetime]:
+    """Start of the current window in UTC; weeks start on Monday"""
+    if window == LeaderboardWindow.ALL_TIME:
+        return None
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if window == LeaderboardWindow.DAILY:
+        return day
+    return day - timedelta(days=day.weekday())
+
+
+class RankedScores:
+    """Scores kept in a sorted list for O(log n) updates and rank lookups, and O(k) top-k.
+
+    Entries are ordered by points, then discoveries, both descending, with the
+    session id as a stable tie-breaker.
+    """
+
+    def __init__(self):
+        self._keys: SortedList = SortedList()
+        self._scores: Dict[str, Tuple[int, int]] = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    @staticmethod
+    def _key(session_id: str, points: int, discoveries: int) -> Tuple[int, int, str]:
+        return (-points, -discoveries, session_id)
+
+    def add(self, session_id: str, points: int = 0, discoveries: int = 0):
+        old = self._scores.get(session_id)
+        if old is not None:
+            self.remove(session_id)
+            points, discoveries = old[0] + points, old[1] + discoveries
+        self._scores[session_id] = (points, discoveries)
+        self._keys.add(self._key(session_id, points, discoveries))
+
+    def remove(self, session_id: str):
+        score = self._scores.pop(session_id, None)
+        if score is not None:
+            self._keys.remove(self._key(session_id, *score))
+
+    def rank(self, session_id: str) -> Optional[Tuple[int, int, int]]:
+        """(1-based rank, points, discoveries) for a session, or None if unranked"""
+        score = self._scores.get(session_id)
+        if score is None:
+            return None
+        return self._keys.bisect_left(self._key(session_id, *score)) + 1, score[0], score[1]
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        return [(session_id, -points, -discoveries) for points, discoveries, session_id in self._keys.islice(0, n)]
+
+
+class Leaderboard:
+    """Daily, weekly and all-time scores per session, maintained incrementally"""
+
+    def __init__(self):
+        self.boards: Dict[LeaderboardWindow, RankedScores] = {window: RankedScores() for window in LeaderboardWindow}
+        self.starts: Dict[LeaderboardWindow, Optional[datetime]] = {
+            window: window_start(window, datetime.utcnow()) for window in LeaderboardWindow
+        }
+
+    def _roll(self, now: datetime):
+        # A window that has ended starts over empty
+        for window in LeaderboardWindow:
+            start = window_start(window, now)
+            if start != self.starts[window]:
+                self.boards[window] = RankedScores()
+                self.starts[window] = start
+
+    def record(self, session_id: str, points: int = 0, discoveries: int = 0, at: Optional[datetime] = None):
+        now = datetime.utcnow()
+        self._roll(now)
+        at = at or now
+        for window, board in self.boards.items():
+            start = self.starts[window]
+            if start is None or at >= start:
+                board.add(session_id, points, discoveries)
+
+    def remove(self, session_id: str):
+        for board in self.boards.values():
+            board.remove(session_id)
+
+    def board(self, window: LeaderboardWindow) -> RankedScores:
+        self._roll(datetime.utcnow())
+        return self.boards[window]
+
+    def replace(self, boards: Dict[LeaderboardWindow, RankedScores], starts: Dict[LeaderboardWindow, Optional[datetime]]):
+        self.boards, self.starts = boards, starts
+
+
+async def rebuild_leaderboard(db, achievement_points: Dict[str, int]) -> Tuple[dict, dict]:
+    """Recompute every window's scores from user_discoveries and user_achievements"""
+    now = datetime.utcnow()
+    boards, starts = {}, {}
+    for window in LeaderboardWindow:
+        start = window_start(window, now)
+        board = RankedScores()
+
+        discoveries = [{"$match": {"discovered_at": {"$gte": start}}}] if start else []
+        discoveries.append({"$group": {"_id": "$session_id", "count": {"$sum": 1}}})
+        async for row in db.user_discoveries.aggregate(discoveries):
+            board.add(row["_id"], discoveries=row["count"])
+
+        unlocks = [{"$match": {"unlocked_at": {"$gte": start}}}] if start else []
+        unlocks.append({"$group": {"_id": "$session_id", "achievement_ids": {"$push": "$achievement_id"}}})
+        async for row in db.user_achievements.aggregate(unlocks):
+            board.add(row["_id"], points=sum(achievement_points.get(a, 0) for a in row["achievement_ids"]))
+
+        boards[window], starts[window] = board, start
+    return boards, starts
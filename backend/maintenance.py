@@ -0,0 +1,157 @@
+"""Maintenance commands for the AR Adventure database.
+
+Run from the repository root, e.g.::
+
+    python -m backend.maintenance backfill-progress
+    python -m backend.maintenance backfill-last-active
+    python -m backend.maintenance seed-catalog --force
+"""
+import asyncio
+from collections import defaultdict
+from typing import List, Optional
+
+import typer
+from pymongo import UpdateOne
+
+from . import seed
+from .server import SEED_FILE, catalog_changed, db, invalidation_bus, logger
+
+cli = typer.Typer(help="AR Adventure maintenance commands")
+
+
+async def backfill_progress(session_ids: Optional[List[str]] = None, batch_size: int = 500) -> int:
+    """Recompute the materialized progress counters from user_discoveries"""
+    plants = {p["id"]: p async for p in db.plants.find({}, {"_id": 0, "id": 1, "rarity": 1})}
+    checkpoints = {c["id"]: c async for c in db.checkpoints.find({}, {"_id": 0, "id": 1, "trail_id": 1})}
+    trails = {t["id"]: t async for t in db.trails.find({}, {"_id": 0, "id": 1, "checkpoint_ids": 1})}
+
+    query = {"session_id": {"$in": session_ids}} if session_ids else {}
+    cursor = db.user_discoveries.find(
+        query,
+        {"_id": 0, "session_id": 1, "checkpoint_id": 1, "plant_id": 1}
+    ).sort("session_id", 1)
+
+    updates = []
+    repaired = 0
+
+    def counters_update(session_id, discoveries):
+        rarity_counts = defaultdict(int)
+        trail_counts = defaultdict(int)
+        for discovery in discoveries:
+            plant = plants.get(discovery["plant_id"])
+            if plant:
+                rarity_counts[plant["rarity"]] += 1
+            checkpoint = checkpoints.get(discovery["checkpoint_id"])
+            if checkpoint:
+                trail_counts[checkpoint["trail_id"]] += 1
+
+        completed_trails = [
+            trail_id for trail_id, count in trail_counts.items()
+            if trail_id in trails and count >= len(trails[trail_id]["checkpoint_ids"])
+        ]
+        return UpdateOne(
+            {"session_id": session_id},
+            {"$set": {
+                "checkpoints_discovered": [d["checkpoint_id"] for d in discoveries],
+                "plants_collected": len(discoveries),
+                "rarity_counts": dict(rarity_counts),
+                "trail_counts": dict(trail_counts),
+                "completed_trails": completed_trails
+            }}
+        )
+
+    async def flush():
+        nonlocal repaired
+        if updates:
+            result = await db.user_progress.bulk_write(updates, ordered=False)
+            repaired += result.matched_count
+            updates.clear()
+
+    # Discoveries arrive grouped by session, so only one session is held at a time
+    current_session, current_discoveries = None, []
+    async for discovery in cursor:
+        if discovery["session_id"] != current_session:
+            if current_session is not None:
+                updates.append(counters_update(current_session, current_discoveries))
+                if len(updates) >= batch_size:
+                    await flush()
+            current_session, current_discoveries = discovery["session_id"], []
+        current_discoveries.append(discovery)
+
+    if current_session is not None:
+        updates.append(counters_update(current_session, current_discoveries))
+    await flush()
+
+    logger.info(f"Backfilled progress counters for {repaired} sessions")
+    return repaired
+
+
+@cli.command("backfill-progress")
+def backfill_progress_command(
+    session_id: Optional[List[str]] = typer.Option(None, help="Only repair these sessions"),
+    batch_size: int = typer.Option(500, help="Progress documents per bulk write")
+):
+    """Recompute rarity, trail and discovery counters on user_progress"""
+    repaired = asyncio.run(backfill_progress(session_id or None, batch_size))
+    typer.echo(f"Repaired {repaired} progress documents")
+
+
+async def backfill_last_active(batch_size: int = 500) -> int:
+    """Raise each session's last_active to its latest progress update or discovery"""
+    latest = {}
+    async for progress in db.user_progress.find(
+        {"updated_at": {"$ne": None}},
+        {"_id": 0, "session_id": 1, "updated_at": 1}
+    ):
+        latest[progress["session_id"]] = progress["updated_at"]
+    async for discovery in db.user_discoveries.aggregate([
+        {"$group": {"_id": "$session_id", "at": {"$max": "$discovered_at"}}}
+    ]):
+        session_id, at = discovery["_id"], discovery["at"]
+        if at and (session_id not in latest or at > latest[session_id]):
+            latest[session_id] = at
+
+    # $max never moves last_active backwards, so running this twice is harmless
+    updates = [
+        UpdateOne({"id": session_id}, {"$max": {"last_active": at}})
+        for session_id, at in latest.items()
+    ]
+    updated = 0
+    for start in range(0, len(updates), batch_size):
+        result = await db.sessions.bulk_write(updates[start:start + batch_size], ordered=False)
+        updated += result.modified_count
+
+    logger.info(f"Backfilled last_active for {updated} sessions")
+    return updated
+
+
+@cli.command("backfill-last-active")
+def backfill_last_active_command(
+    batch_size: int = typer.Option(500, help="Sessions per bulk write")
+):
+    """Set last_active from progress and discoveries; run before enabling session expiry"""
+    updated = asyncio.run(backfill_last_active(batch_size))
+    typer.echo(f"Updated last_active of {updated} sessions")
+
+
+@cli.command("seed-catalog")
+def seed_catalog_command(
+    path: str = typer.Option(SEED_FILE, help="Seed data file"),
+    force: bool = typer.Option(False, help="Rewrite every seeded item, even if the file is unchanged")
+):
+    """Apply the catalog seed file to plants, trails, checkpoints and achievements"""
+    async def run():
+        changed = await seed.apply_seed(db, path, force)
+        if changed:
+            await catalog_changed(*changed)
+            # Nothing flushes the bus in this process; running workers only drop
+            # their cached catalogs once the message is written
+            await invalidation_bus.flush()
+        return changed
+
+    changed = asyncio.run(run())
+    typer.echo(f"Updated {', '.join(changed)}" if changed else "Catalog already up to date")
+
+
+if __name__ == "__main__":
+    cli()
@@ -72,6 +72,9 @@ class CheckpointWithPlant(BaseModel):
     discovered_count: int
     discovered: bool = False
 
+class NearbyCheckpoint(CheckpointWithPlant):
+    distance: float  # from the queried position, in map units
+
 # Trail Models
 class Trail(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -93,6 +96,11 @@ class TrailCreate(BaseModel):
     checkpoint_ids: List[str]
     image_url: Optional[str] = None
 
+class TrailRoute(BaseModel):
+    trail_id: str
+    checkpoint_ids: List[str]  # suggested visiting order
+    total_distance: float  # in map units, including the walk from the start position
+
 # User Progress Models
 class UserSession(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -117,6 +125,8 @@ class UserProgress(BaseModel):
     total_distance: float = 0.0
     time_spent: int = 0  # in minutes
     plants_collected: int = 0
+    rarity_counts: Dict[str, int] = {}  # discoveries per plant rarity
+    trail_counts: Dict[str, int] = {}  # discoveries per trail
     achievements_unlocked: List[str] = []
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -149,17 +159,28 @@ class UserAchievement(BaseModel):
     unlocked_at: datetime = Field(default_factory=datetime.utcnow)
 
 # Map Models
+class MapTiles(BaseModel):
+    tile_size: int
+    max_zoom: int  # full resolution; level 0 fits in a single tile
+    width: int
+    height: int
+    image_type: str  # MIME type of the tiles
+    tile_url: str  # template with {z}, {x} and {y} placeholders
+
 class MapImage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
-    image_data: str  # base64 encoded image
+    blob_id: str  # reference into the blob store
     image_type: str  # MIME type
+    size: int  # in bytes
+    etag: str  # sha256 of the image bytes
+    image_url: str  # binary download endpoint
+    tiles: Optional[MapTiles] = None  # set once the tile pyramid is generated
     trail_id: str
     uploaded_at: datetime = Field(default_factory=datetime.utcnow)
 
 class MapImageCreate(BaseModel):
     name: str
-    image_data: str
     image_type: str
     trail_id: str
 
@@ -171,6 +192,15 @@ class DiscoveryResponse(BaseModel):
     achievement_unlocked: Optional[Achievement] = None
     progress: Optional[UserProgress] = None
 
+class DiscoveryEvent(BaseModel):
+    checkpoint_id: str
+    discovered_at: Optional[datetime] = None  # when the device saw it, if offline
+
+class DiscoveryBatchResponse(BaseModel):
+    results: List[DiscoveryResponse]  # one per submitted event, in order
+    achievements_unlocked: List[Achievement] = []
+    progress: Optional[UserProgress] = None
+
 class ProgressSummary(BaseModel):
     session_id: str
     total_discoveries: int
@@ -209,4 +239,67 @@ class ARSettingsUpdate(BaseModel):
     vibration_enabled: Optional[bool] = None
     show_hints: Optional[bool] = None
     marker_detection_sensitivity: Optional[float] = None
-    render_quality: Optional[str] = None
\ No newline at end of file
+    render_quality: Optional[str] = None
+
+# Bootstrap Models
+class BootstrapResponse(BaseModel):
+    session: UserSession
+    trails: List[Trail]
+    checkpoints: List[CheckpointWithPlant]
+    achievements: List[Achievement]
+    settings: ARSettings
+    progress: Optional[ProgressSummary] = None
+    map: Optional[MapImage] = None
+
+# Leaderboard Models
+class LeaderboardWindow(str, Enum):
+    DAILY = "daily"
+    WEEKLY = "weekly"
+    ALL_TIME = "all_time"
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    player: str  # anonymized session identifier
+    points: int
+    discoveries: int
+
+class LeaderboardResponse(BaseModel):
+    window: LeaderboardWindow
+    total_players: int
+    entries: List[LeaderboardEntry]
+
+# Analytics Models
+class AnalyticsGroup(str, Enum):
+    CHECKPOINT = "checkpoint"
+    PLANT = "plant"
+
+class AnalyticsBucket(str, Enum):
+    HOUR = "hour"
+    DAY = "day"
+
+class DiscoveryHeatmap(BaseModel):
+    group: AnalyticsGroup
+    since: datetime
+    until: datetime
+    cells: Dict[str, List[List[int]]]  # per id: 7 weekdays (Monday first) x 24 hours, UTC
+
+class DiscoveryCount(BaseModel):
+    at: datetime
+    count: int
+
+class DiscoveryTimeseries(BaseModel):
+    group: AnalyticsGroup
+    bucket: AnalyticsBucket
+    since: datetime
+    until: datetime
+    series: Dict[str, List[DiscoveryCount]]
+
+class FunnelStep(BaseModel):
+    checkpoint_id: str
+    name: str
+    discoveries: int
+    drop_off: float  # 1 - discoveries / previous step's discoveries, floored at 0 (a ratio of counts)
+
+class TrailFunnel(BaseModel):
+    trail_id: str
+    steps: List[FunnelStep]
@@ -0,0 +1,29 @@
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class ModelResponse(ORJSONResponse):
+    """orjson response that also serializes pydantic models.
+
+    Returning one from an endpoint skips FastAPI's ``response_model`` handling,
+    which would otherwise validate the already-built models a second time and
+    encode them with ``jsonable_encoder``. The route's ``response_model`` is
+    still used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def model_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> ModelResponse:
+    """Wrap validated models, keeping headers already set on the endpoint's ``response``"""
+    return ModelResponse(content, status_code=status_code, headers=dict(response.headers) if response else None)
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Upper bound on 2-opt refinement; the nearest-neighbour route is always returned
+TIME_BUDGET = 1.0
+
+
+def distance_matrix(points: np.ndarray) -> np.ndarray:
+    """Pairwise Euclidean distances between (n, 2) points"""
+    # Centering keeps the expansion below numerically stable
+    points = points - points.mean(axis=0)
+    squared = (points ** 2).sum(axis=1)
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab avoids materializing an (n, n, 2) array
+    dist_sq = squared[:, None] + squared[None, :] - 2 * points @ points.T
+    np.maximum(dist_sq, 0, out=dist_sq)
+    return np.sqrt(dist_sq, out=dist_sq).astype(np.float32)
+
+
+def nearest_neighbour(dist: np.ndarray, start: int = 0) -> np.ndarray:
+    """Greedy route that always walks to the closest unvisited point"""
+    n = len(dist)
+    order = np.empty(n, dtype=np.int64)
+    visited = np.zeros(n, dtype=bool)
+    current = start
+    for step in range(n):
+        order[step] = current
+        visited[current] = True
+        if step < n - 1:
+            candidates = np.where(visited, np.inf, dist[current])
+            current = int(np.argmin(candidates))
+    return order
+
+
+def two_opt(order: np.ndarray, dist: np.ndarray, time_budget: float = TIME_BUDGET) -> np.ndarray:
+    """Improve an open route with a fixed first point by reversing segments.
+
+    For each position ``i`` the gain of every possible reversal ``order[i:j+1]``
+    is computed in one vectorized step and the best one is applied.
+    """
+    order = order.copy()
+    n = len(order)
+    if n < 4:
+        return order
+
+    deadline = time.monotonic() + time_budget
+    improved = True
+    while improved and time.monotonic() < deadline:
+        improved = False
+        for i in range(1, n - 1):
+            a, b = order[i - 1], order[i]
+            js = np.arange(i + 1, n)
+            c = order[js]
+            following = order[np.minimum(js + 1, n - 1)]
+            # Reversing up to the last point of an open route leaves no closing edge
+            tail = np.where(js < n - 1, dist[b, following] - dist[c, following], 0.0)
+            delta = dist[a, c] - dist[a, b] + tail
+
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-6:
+                j = js[k]
+                order[i:j + 1] = order[i:j + 1][::-1].copy()
+                improved = True
+            if time.monotonic() >= deadline:
+                break
+    return order
+
+
+def route_length(order: np.ndarray, dist: np.ndarray) -> float:
+    if len(order) < 2:
+        return 0.0
+    return float(dist[order[:-1], order[1:]].sum())
+
+
+def plan_route(
+    points: Sequence[Tuple[float, float]],
+    start: Optional[Tuple[float, float]] = None,
+    initial: Optional[Sequence[int]] = None,
+    time_budget: float = TIME_BUDGET
+) -> Tuple[List[int], float]:
+    """Compute a short visiting order over ``points``.
+
+    The route begins at ``start`` when given (it is not part of the returned
+    order), otherwise at the first point. ``initial`` seeds the search with an
+    existing order instead of a nearest-neighbour walk. Returns the order as
+    indices into ``points`` and the route length.
+    """
+    if not points:
+        return [], 0.0
+
+    coords = np.asarray(points, dtype=np.float64)
+    offset = 0
+    if start is not None:
+        coords = np.vstack([np.asarray(start, dtype=np.float64), coords])
+        offset = 1
+    dist = distance_matrix(coords)
+
+    if initial is not None:
+        order = np.concatenate([np.arange(offset), np.asarray(initial, dtype=np.int64) + offset])
+    else:
+        order = nearest_neighbour(dist, 0)
+    order = two_opt(order, dist, time_budget)
+
+    length = route_length(order, dist)
+    return [int(i) - offset for i in order[offset:]], length
+
+
+Route = Tuple[List[str], float]
+
+
+class RouteCache:
+    """Per-trail routes, dropped whenever a catalog they are built from reloads.
+
+    ``source`` is the tuple of cached catalog lists (checkpoints and trails);
+    the catalog cache hands out new lists on every reload, so a change in any
+    of them is detected by identity.
+    """
+
+    def __init__(self):
+        self._source: Tuple[List[dict], ...] = ()
+        self._routes: Dict[str, Route] = {}
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _is_current(self, source: Tuple[List[dict], ...]) -> bool:
+        return len(source) == len(self._source) and all(a is b for a, b in zip(source, self._source))
+
+    def get(self, source: Tuple[List[dict], ...], trail_id: str) -> Optional[Route]:
+        if not self._is_current(source):
+            self._routes.clear()
+            self._pending.clear()
+            self._source = tuple(source)
+        return self._routes.get(trail_id)
+
+    def set(self, source: Tuple[List[dict], ...], trail_id: str, route: Route):
+        if self._is_current(source):
+            self._routes[trail_id] = route
+
+    async def get_or_compute(
+        self,
+        source: Tuple[List[dict], ...],
+        trail_id: str,
+        compute: Callable[[], Awaitable[Route]]
+    ) -> Route:
+        """Return the cached route of a trail, computing it once for all concurrent callers"""
+        route = self.get(source, trail_id)
+        if route is not None:
+            return route
+
+        task = self._pending.get(trail_id)
+        if task is None:
+            async def run() -> Route:
+                route = await compute()
+                self.set(source, trail_id, route)
+                return route
+
+            task = self._pending[trail_id] = asyncio.ensure_future(run())
+
+            def done(_):
+                if self._pending.get(trail_id) is task:
+                    del self._pending[trail_id]
+
+            task.add_done_callback(done)
+        # A caller going away must not cancel the computation the others wait on
+        return await asyncio.shield(task)
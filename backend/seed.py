@@ -0,0 +1,89 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+from pymongo import DeleteMany, UpdateOne
+
+from .models import Achievement, Checkpoint, Plant, Trail
+
+SEED_FILE = Path(__file__).parent / "data" / "catalog.json"
+STATE_ID = "catalog"
+
+SEED_MODELS = {
+    "plants": Plant,
+    "trails": Trail,
+    "checkpoints": Checkpoint,
+    "achievements": Achievement,
+}
+# Only set when an item is first inserted, so re-seeding keeps creation times
+# and live counters
+INSERT_ONLY_FIELDS = ("created_at", "discovered_count")
+
+
+def load_seed(path: Union[str, Path]) -> Tuple[str, Dict[str, List[dict]]]:
+    """Read a seed file, returning its content hash and the items of each catalog"""
+    raw = Path(path).read_bytes()
+    data = json.loads(raw)
+    return hashlib.sha256(raw).hexdigest()[:16], {name: data.get(name, []) for name in SEED_MODELS}
+
+
+def item_hash(item: dict) -> str:
+    return hashlib.sha256(json.dumps(item, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def upsert(doc: dict) -> UpdateOne:
+    return UpdateOne(
+        {"id": doc["id"]},
+        {
+            "$set": {key: value for key, value in doc.items() if key not in INSERT_ONLY_FIELDS},
+            "$setOnInsert": {key: doc[key] for key in INSERT_ONLY_FIELDS if key in doc},
+        },
+        upsert=True
+    )
+
+
+async def apply_seed(db, path: Union[str, Path] = SEED_FILE, force: bool = False) -> List[str]:
+    """Bring the catalog collections in line with a seed file.
+
+    The file's hash is compared with the one stored in ``seed_state`` when it
+    was last applied, so an unchanged seed costs a single read. Otherwise the
+    items whose content changed are upserted and items dropped from the file
+    are deleted, one ``bulk_write`` per collection. Items created through the
+    API are never touched. ``force`` rewrites every item, repairing documents
+    that were edited or deleted by hand. Returns the collections written to.
+    """
+    version, catalogs = load_seed(path)
+    state = await db.seed_state.find_one({"_id": STATE_ID}) or {}
+    if state.get("version") == version and not force:
+        return []
+
+    applied = {} if force else state.get("items", {})
+    hashes: Dict[str, Dict[str, str]] = {}
+    writes = {}
+    for name, model in SEED_MODELS.items():
+        previous = applied.get(name, {})
+        hashes[name] = {}
+        requests = []
+        for item in catalogs[name]:
+            doc = model(**item).dict()
+            hashes[name][doc["id"]] = item_hash(item)
+            if previous.get(doc["id"]) != hashes[name][doc["id"]]:
+                requests.append(upsert(doc))
+
+        removed = [item_id for item_id in previous if item_id not in hashes[name]]
+        if removed:
+            requests.append(DeleteMany({"id": {"$in": removed}}))
+        if requests:
+            writes[name] = db[name].bulk_write(requests, ordered=False)
+
+    await asyncio.gather(*writes.values())
+    # Recorded last, so a seed interrupted half way is applied again on the next start
+    await db.seed_state.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"version": version, "items": hashes, "applied_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return list(writes)
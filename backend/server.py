@@ -1,31 +1,118 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from PIL import UnidentifiedImageError
 import os
+import asyncio
 import logging
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Set, Tuple, Type, Union
 import base64
+import bisect
 import uuid
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict
 
 # Import models
 from .models import *
+from .cache import CatalogCache, LRUCache
+from .blob_store import CHUNK_SIZE, BlobNotFound, create_blob_store
+from . import tiles
+from .achievements import AchievementEngine
+from .spatial import SpatialIndexCache
+from .routing import RouteCache, plan_route
+from . import metrics
+from .counters import CounterBuffer
+from .leaderboard import Leaderboard, player_tag, rebuild_leaderboard
+from . import analytics
+from .responses import ModelResponse, model_response
+from . import seed
+from .events import EventHub, event_stream
+from .bus import InvalidationBus
+from .admission import AdmissionMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[metrics.MongoCommandListener()])
 db = client[os.environ['DB_NAME']]
 
+# In-process cache for plants, trails, checkpoints and achievements; writes in
+# other workers arrive through the invalidation bus, the TTL is a safety net
+catalog_cache = CatalogCache(ttl=float(os.environ.get('CATALOG_CACHE_TTL', '3600')))
+
+# Storage for map images and other large binaries
+blob_store = create_blob_store(db)
+
+# Per-session AR settings, written through on update
+settings_cache = LRUCache(maxsize=int(os.environ.get('SETTINGS_CACHE_SIZE', '10000')))
+
+# Achievement rules compiled from the cached achievement catalog
+achievement_engine = AchievementEngine()
+
+# Grid index over checkpoint positions, rebuilt when the checkpoint catalog reloads
+checkpoint_index = SpatialIndexCache()
+
+# Per-trail visiting orders, recomputed when the checkpoint or trail catalog reloads
+route_cache = RouteCache()
+
+# Checkpoint discovered_count increments, coalesced and flushed in bulk; the
+# persisted counts are re-read periodically for views served from the catalog cache
+discovery_counter = CounterBuffer(
+    db.checkpoints,
+    "discovered_count",
+    interval=float(os.environ.get('DISCOVERY_COUNTER_FLUSH_INTERVAL', '1.0')),
+    refresh_interval=float(os.environ.get('DISCOVERY_COUNT_REFRESH_INTERVAL', '10'))
+)
+
+# Largest burst of offline discoveries accepted in one request
+MAX_DISCOVERY_BATCH = int(os.environ.get('MAX_DISCOVERY_BATCH', '500'))
+
+# Sessions idle for longer than this are expired with all their data (0 disables)
+SESSION_TTL_DAYS = float(os.environ.get('SESSION_TTL_DAYS', '90'))
+SESSION_SWEEP_INTERVAL = float(os.environ.get('SESSION_SWEEP_INTERVAL', '3600'))
+
+# In-memory leaderboard; scores recorded by other workers arrive through the
+# invalidation bus, and it is rebuilt from Mongo on startup and periodically
+leaderboard = Leaderboard()
+LEADERBOARD_REBUILD_INTERVAL = float(os.environ.get('LEADERBOARD_REBUILD_INTERVAL', '600'))
+
+# Live per-session updates pushed to /events subscribers of this worker
+event_hub = EventHub()
+
+# Tells the other workers about writes that affect their in-memory state
+invalidation_bus = InvalidationBus(db, flush_interval=float(os.environ.get('BUS_FLUSH_INTERVAL', '0.1')))
+
+# Catalog seed data, applied in the background at startup when it changes
+SEED_FILE = os.environ.get('SEED_FILE', str(seed.SEED_FILE))
+
+# Discoveries are rolled up into hourly counts for /analytics/*
+ANALYTICS_ROLLUP_INTERVAL = float(os.environ.get('ANALYTICS_ROLLUP_INTERVAL', '300'))
+ANALYTICS_DEFAULT_DAYS = 7
+
+# Requests in flight before new ones are shed with 429; defaults to the size of
+# Motor's connection pool so requests do not queue for a connection (0 disables)
+MAX_CONCURRENT_REQUESTS = int(os.environ.get(
+    'MAX_CONCURRENT_REQUESTS', client.options.pool_options.max_pool_size
+))
+
+# Browser/CDN caching of catalog responses, revalidated with ETags
+CATALOG_CACHE_CONTROL = f"public, max-age={os.environ.get('CATALOG_MAX_AGE', '60')}, must-revalidate"
+
 # Create the main app
 app = FastAPI(title="AR Adventure API", version="1.0.0")
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=ModelResponse)
+
+# Admission control, inside CORS so 429 responses are readable by the browser
+app.add_middleware(AdmissionMiddleware, max_concurrent=MAX_CONCURRENT_REQUESTS)
 
 # CORS middleware
 app.add_middleware(
@@ -34,189 +121,400 @@ app.add_middleware(
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Link", "X-Next-Cursor"],
 )
 
+# Per-route request metrics, exposed at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize default data
-async def initialize_default_data():
-    """Initialize the database with default plants, checkpoints, and trails"""
-    
-    # Check if data already exists
-    existing_plants = await db.plants.count_documents({})
-    if existing_plants > 0:
-        logger.info("Default data already exists, skipping initialization")
-        return
+# Indexes for every collection the API queries
+INDEXES = {
+    "plants": [IndexModel([("id", ASCENDING)], unique=True)],
+    "trails": [IndexModel([("id", ASCENDING)], unique=True)],
+    "checkpoints": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("trail_id", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "achievements": [IndexModel([("id", ASCENDING)], unique=True)],
+    "sessions": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("device_id", ASCENDING)]),
+        IndexModel([("last_active", ASCENDING)]),
+    ],
+    "user_progress": [IndexModel([("session_id", ASCENDING)], unique=True)],
+    "user_discoveries": [
+        # Makes recording a discovery idempotent per session and checkpoint
+        IndexModel([("session_id", ASCENDING), ("checkpoint_id", ASCENDING)], unique=True),
+        IndexModel([("session_id", ASCENDING), ("id", ASCENDING)]),
+        # Daily and weekly leaderboard rebuilds
+        IndexModel([("discovered_at", ASCENDING)]),
+    ],
+    "user_achievements": [
+        IndexModel([("session_id", ASCENDING), ("achievement_id", ASCENDING)], unique=True),
+        IndexModel([("unlocked_at", ASCENDING)]),
+    ],
+    "maps": [IndexModel([("trail_id", ASCENDING)])],
+    "map_tiles": [
+        IndexModel([("map_id", ASCENDING), ("z", ASCENDING), ("x", ASCENDING), ("y", ASCENDING)], unique=True),
+    ],
+    "settings": [IndexModel([("session_id", ASCENDING)], unique=True)],
+    "discovery_rollups": [
+        IndexModel([("checkpoint_id", ASCENDING), ("hour", ASCENDING)], unique=True),
+        IndexModel([("hour", ASCENDING)]),
+        IndexModel([("trail_id", ASCENDING)]),
+    ],
+}
+
+# Unique indexes that make writes idempotent. Duplicates recorded before they
+# existed are collapsed to the earliest record when the index is first built
+DEDUPLICATE = {
+    "user_discoveries": (("session_id", "checkpoint_id"), "discovered_at"),
+    "user_achievements": (("session_id", "achievement_id"), "unlocked_at"),
+}
+
+async def remove_duplicates(collection: str, fields: Tuple[str, ...], earliest_by: str) -> int:
+    """Delete all but the earliest document of each group of duplicates on ``fields``"""
+    groups = db[collection].aggregate([
+        {"$sort": {earliest_by: ASCENDING}},
+        {"$group": {
+            "_id": {field: f"${field}" for field in fields},
+            "ids": {"$push": "$_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
     
-    # Default plants
-    default_plants = [
-        Plant(
-            id="plant_1",
-            name="Bird's Nest Fern",
-            scientific_name="Asplenium nidus",
-            description="A large epiphytic fern native to tropical regions. Its distinctive nest-like shape helps collect water and organic debris.",
-            facts=["Can grow up to 1.5 meters wide", "Epiphytic - grows on other plants", "Popular as houseplant"],
-            rarity=PlantRarity.COMMON,
-            habitat="Tropical rainforests, epiphytic on trees",
-            conservation_status="Least Concern"
-        ),
-        Plant(
-            id="plant_2",
-            name="Giant Bamboo",
-            scientific_name="Dendrocalamus giganteus",
-            description="One of the largest bamboo species in the world. It can grow extremely fast and is used for construction.",
-            facts=["Can grow up to 3 feet per day", "Reaches heights of 100+ feet", "Stronger than steel in tensile strength"],
-            rarity=PlantRarity.UNCOMMON,
-            habitat="Tropical and subtropical regions",
-            conservation_status="Stable"
-        ),
-        Plant(
-            id="plant_3",
-            name="Wild Orchid",
-            scientific_name="Vanda hookeriana",
-            description="A beautiful epiphytic orchid species endemic to Southeast Asia. Known for its fragrant flowers.",
-            facts=["Blooms year-round", "Requires high humidity", "Protected species"],
-            rarity=PlantRarity.RARE,
-            habitat="Tropical forests, epiphytic on trees",
-            conservation_status="Vulnerable"
-        ),
-        Plant(
-            id="plant_4",
-            name="Meranti Tree",
-            scientific_name="Shorea sp.",
-            description="A tall tropical hardwood tree, part of the dipterocarp family. Important for timber and ecosystem.",
-            facts=["Can live over 100 years", "Provides canopy shelter", "Seeds have wing-like structures"],
-            rarity=PlantRarity.COMMON,
-            habitat="Tropical rainforests, lowland areas",
-            conservation_status="Near Threatened"
-        ),
-        Plant(
-            id="plant_5",
-            name="Tropical Pitcher Plant",
-            scientific_name="Nepenthes rafflesiana",
-            description="A carnivorous plant with modified leaves that form pitcher-shaped traps to catch insects.",
-            facts=["Carnivorous plant", "Pitchers can hold 200ml of water", "Endemic to Southeast Asia"],
-            rarity=PlantRarity.RARE,
-            habitat="Tropical peat swamps and forests",
-            conservation_status="Vulnerable"
+    removed = 0
+    async for group in groups:
+        result = await db[collection].delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    if removed:
+        logger.warning(
+            f"Removed {removed} duplicate documents from {collection}; "
+            "run 'python -m backend.maintenance backfill-progress' to correct progress counters"
         )
-    ]
+    return removed
+
+async def ensure_indexes():
+    """Create any missing indexes declared in INDEXES.
     
-    # Insert plants
-    for plant in default_plants:
-        await db.plants.insert_one(plant.dict())
-    
-    # Default trail
-    default_trail = Trail(
-        id="trail_1",
-        name="Bukit Kiara Main Trail",
-        difficulty=TrailDifficulty.EASY,
-        distance="2.5 km",
-        duration="1-2 hours",
-        description="The main trail loop suitable for all fitness levels",
-        checkpoint_ids=["checkpoint_1", "checkpoint_2", "checkpoint_3", "checkpoint_4", "checkpoint_5"]
-    )
+    Startup fails if a unique index cannot be built, since discoveries and
+    achievements would otherwise be recorded more than once.
+    """
+    async def ensure(collection: str, indexes: List[IndexModel]):
+        if collection in DEDUPLICATE:
+            fields, earliest_by = DEDUPLICATE[collection]
+            name = "_".join(f"{field}_1" for field in fields)
+            if name not in await db[collection].index_information():
+                await remove_duplicates(collection, fields, earliest_by)
+        try:
+            await db[collection].create_indexes(indexes)
+        except OperationFailure as e:
+            # e.g. existing duplicates prevent a unique index from being built
+            logger.error(f"Could not ensure indexes on {collection}: {e}")
+            if any(index.document.get("unique") for index in indexes):
+                raise
     
-    await db.trails.insert_one(default_trail.dict())
-    
-    # Default checkpoints
-    default_checkpoints = [
-        Checkpoint(
-            id="checkpoint_1",
-            name="Fern Valley",
-            position=CheckpointPosition(x=20, y=25),
-            plant_id="plant_1",
-            color="#22c55e",
-            trail_id="trail_1"
-        ),
-        Checkpoint(
-            id="checkpoint_2",
-            name="Bamboo Grove",
-            position=CheckpointPosition(x=70, y=40),
-            plant_id="plant_2",
-            color="#eab308",
-            trail_id="trail_1"
-        ),
-        Checkpoint(
-            id="checkpoint_3",
-            name="Orchid Point",
-            position=CheckpointPosition(x=45, y=15),
-            plant_id="plant_3",
-            color="#a855f7",
-            trail_id="trail_1"
-        ),
-        Checkpoint(
-            id="checkpoint_4",
-            name="Dipterocarp Trail",
-            position=CheckpointPosition(x=35, y=60),
-            plant_id="plant_4",
-            color="#dc2626",
-            trail_id="trail_1"
-        ),
-        Checkpoint(
-            id="checkpoint_5",
-            name="Pitcher Plant Bog",
-            position=CheckpointPosition(x=80, y=70),
-            plant_id="plant_5",
-            color="#f59e0b",
-            trail_id="trail_1"
-        )
-    ]
+    # One concurrent round instead of a round trip per collection
+    await asyncio.gather(*[ensure(collection, indexes) for collection, indexes in INDEXES.items()])
+
+# Catalog helpers
+async def get_catalog(name: str) -> List[dict]:
+    """Get every document of a catalog collection through the cache"""
+    async def load():
+        # Sorted by id so pages can be cut with a binary search
+        return await db[name].find({}, {"_id": 0}).sort("id", ASCENDING).to_list(None)
+    return await catalog_cache.get(name, load)
+
+async def get_catalog_item(name: str, item_id: str) -> Optional[dict]:
+    """Get a single catalog document by id through the cache"""
+    async def load():
+        return {doc["id"]: doc for doc in await get_catalog(name)}
+    items = await catalog_cache.get(f"{name}:by_id", load)
     
-    for checkpoint in default_checkpoints:
-        await db.checkpoints.insert_one(checkpoint.dict())
-    
-    # Default achievements
-    default_achievements = [
-        Achievement(
-            id="achievement_1",
-            name="First Discovery",
-            description="Discover your first plant checkpoint",
-            icon="🌱",
-            condition="discover_plants",
-            condition_value=1,
-            points=10
-        ),
-        Achievement(
-            id="achievement_2",
-            name="Plant Expert",
-            description="Discover 5 different plant species",
-            icon="🌿",
-            condition="discover_plants",
-            condition_value=5,
-            points=50
-        ),
-        Achievement(
-            id="achievement_3",
-            name="Rare Collector",
-            description="Find all rare plant species",
-            icon="🌺",
-            condition="discover_rare_plants",
-            condition_value=2,
-            points=100
-        ),
-        Achievement(
-            id="achievement_4",
-            name="Trail Master",
-            description="Complete all available trails",
-            icon="🏆",
-            condition="complete_trails",
-            condition_value=1,
-            points=200
+    item = items.get(item_id)
+    if item is None:
+        # May have been written by another worker since the cache was filled
+        item = await db[name].find_one({"id": item_id}, {"_id": 0})
+    return item
+
+async def get_catalog_models(name: str, model: Type[BaseModel]) -> Dict[str, BaseModel]:
+    """Get a catalog validated into models once per cache fill, keyed by id"""
+    async def load():
+        return {doc["id"]: model(**doc) for doc in await get_catalog(name)}
+    return await catalog_cache.get(f"{name}:models", load)
+
+async def get_catalog_model(name: str, model: Type[BaseModel], item_id: str) -> Optional[BaseModel]:
+    """Get a single catalog item as a model, falling back to get_catalog_item"""
+    item = (await get_catalog_models(name, model)).get(item_id)
+    if item is None:
+        doc = await get_catalog_item(name, item_id)
+        item = model(**doc) if doc else None
+    return item
+
+async def catalog_page(
+    name: str,
+    model: Type[BaseModel],
+    after: Optional[str],
+    limit: Optional[int]
+) -> Tuple[List[BaseModel], Optional[str]]:
+    """Cut a page out of a catalog as cached models, returning it with the next cursor"""
+    items, next_cursor = paginate(await get_catalog(name), after, limit)
+    models = await get_catalog_models(name, model)
+    return [models.get(item["id"]) or model(**item) for item in items], next_cursor
+
+def invalidate_catalog(*names: str):
+    """Drop cached catalog data after a write"""
+    catalog_cache.invalidate(*[
+        key for name in names for key in (name, f"{name}:by_id", f"{name}:models", f"version:{name}")
+    ])
+
+async def get_catalog_version(name: str) -> str:
+    """Get the version token of a catalog, bumped on every write to it"""
+    async def load():
+        doc = await db.catalog_versions.find_one({"_id": name})
+        # The epoch keeps tokens unique if the collection is ever dropped and recreated
+        return f"{doc['epoch']}-{doc['version']}" if doc else "0"
+    return await catalog_cache.get(f"version:{name}", load)
+
+async def catalog_changed(*names: str):
+    """Record a write to the given catalogs: bump their versions and drop cached data"""
+    await asyncio.gather(*[
+        db.catalog_versions.update_one(
+            {"_id": name},
+            {"$inc": {"version": 1}, "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}},
+            upsert=True
         )
-    ]
+        for name in names
+    ])
+    invalidate_catalog(*names)
+    for name in names:
+        invalidation_bus.publish("catalog", name)
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check an ETag against If-None-Match using weak comparison"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    
+    def opaque(tag: str) -> str:
+        tag = tag.strip()
+        return tag[2:] if tag.startswith("W/") else tag
+    
+    return any(tag.strip() == "*" or opaque(tag) == opaque(etag) for tag in if_none_match.split(","))
+
+async def catalog_conditional(
+    request: Request,
+    response: Response,
+    name: str,
+    negotiated: bool = False
+) -> Optional[Response]:
+    """Set caching headers for a catalog response, returning a 304 if the client is current.
     
-    for achievement in default_achievements:
-        await db.achievements.insert_one(achievement.dict())
+    ``negotiated`` responses are served as JSON or NDJSON depending on Accept,
+    so each representation gets its own ETag and caches are told to key on it.
+    """
+    tag = f"{name}-{await get_catalog_version(name)}"
+    if negotiated and wants_ndjson(request):
+        tag += "-ndjson"
+    headers = {
+        "ETag": f'W/"{tag}"',
+        "Cache-Control": CATALOG_CACHE_CONTROL
+    }
+    if negotiated:
+        headers["Vary"] = "Accept"
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Pagination and streaming helpers
+MAX_PAGE_SIZE = 1000
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def paginate(items: List[dict], after: Optional[str], limit: Optional[int]) -> Tuple[List[dict], Optional[str]]:
+    """Cut a page out of an id-sorted list, returning it with the next cursor"""
+    start = bisect.bisect_right(items, after, key=lambda item: item["id"]) if after else 0
+    if not limit:
+        return items[start:], None
+    page = items[start:start + limit]
+    return page, (page[-1]["id"] if start + limit < len(items) else None)
+
+def set_next_cursor(request: Request, response: Response, next_cursor: Optional[str]):
+    """Advertise the next page of a keyset-paginated listing"""
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+        response.headers["Link"] = f'<{request.url.include_query_params(after=next_cursor)}>; rel="next"'
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+def ndjson_response(models: Union[Iterable[BaseModel], AsyncIterator[BaseModel]], response: Response) -> StreamingResponse:
+    """Stream models as newline-delimited JSON without buffering the whole result"""
+    async def body():
+        if hasattr(models, "__aiter__"):
+            async for model in models:
+                yield model.model_dump_json() + "\n"
+        else:
+            for model in models:
+                yield model.model_dump_json() + "\n"
+    
+    return StreamingResponse(body(), media_type=NDJSON_MEDIA_TYPE, headers=dict(response.headers))
+
+# Initialize default data
+async def initialize_default_data():
+    """Bring the default plants, checkpoints, trails and achievements up to date with the seed file"""
+    try:
+        changed = await seed.apply_seed(db, SEED_FILE)
+    except Exception:
+        logger.exception(f"Could not apply seed data from {SEED_FILE}")
+        return
+    
+    if changed:
+        await catalog_changed(*changed)
+        logger.info(f"Seed data applied to {', '.join(changed)}")
+
+# Background work
+background_tasks: Set[asyncio.Task] = set()
+
+def spawn(coro) -> asyncio.Task:
+    """Run a coroutine in the background, keeping a reference to it until it finishes"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+async def run_periodically(interval: float, job):
+    """Run a coroutine function every ``interval`` seconds until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except Exception:
+            logger.exception(f"Periodic job {job.__name__} failed")
+
+async def expire_idle_sessions(batch_size: int = 500):
+    """Delete sessions idle for longer than SESSION_TTL_DAYS, with their progress, settings and discoveries"""
+    cutoff = datetime.utcnow() - timedelta(days=SESSION_TTL_DAYS)
+    expired = 0
+    while True:
+        session_ids = [
+            s["id"] async for s in
+            db.sessions.find({"last_active": {"$lt": cutoff}}, {"_id": 0, "id": 1}).limit(batch_size)
+        ]
+        if not session_ids:
+            break
+        
+        # last_active was not maintained before the sweeper existed; sessions with
+        # recent progress are still in use, so their activity is carried over
+        recent = {
+            p["session_id"]: p["updated_at"]
+            async for p in db.user_progress.find(
+                {"session_id": {"$in": session_ids}, "updated_at": {"$gte": cutoff}},
+                {"_id": 0, "session_id": 1, "updated_at": 1}
+            )
+        }
+        if recent:
+            await db.sessions.bulk_write(
+                [UpdateOne({"id": session_id}, {"$max": {"last_active": at}}) for session_id, at in recent.items()],
+                ordered=False
+            )
+            session_ids = [session_id for session_id in session_ids if session_id not in recent]
+            if not session_ids:
+                continue
+        
+        query = {"session_id": {"$in": session_ids}}
+        await asyncio.gather(
+            db.user_progress.delete_many(query),
+            db.settings.delete_many(query),
+            db.user_discoveries.delete_many(query),
+            db.user_achievements.delete_many(query)
+        )
+        # Sessions go last so an interrupted sweep is picked up again next time
+        await db.sessions.delete_many({"id": {"$in": session_ids}})
+        for session_id in session_ids:
+            settings_cache.pop(session_id)
+            leaderboard.remove(session_id)
+        invalidation_bus.publish("sessions_expired", data={"session_ids": session_ids})
+        expired += len(session_ids)
     
-    logger.info("Default data initialized successfully")
+    if expired:
+        logger.info(f"Expired {expired} idle sessions")
+
+async def refresh_leaderboard():
+    """Rebuild the leaderboard windows from user_discoveries and user_achievements"""
+    points = {a["id"]: a["points"] for a in await get_catalog("achievements")}
+    leaderboard.replace(*await rebuild_leaderboard(db, points))
+
+async def rollup_discoveries():
+    """Fold new user_discoveries into the hourly analytics rollups"""
+    checkpoint_trails = {c["id"]: c["trail_id"] for c in await get_catalog("checkpoints")}
+    processed = await analytics.rollup_discoveries(db, checkpoint_trails)
+    if processed:
+        logger.info(f"Rolled up {processed} discoveries")
+
+# Cross-worker coherence: apply writes made by other workers to local state.
+# A key of None means messages may have been lost and everything is reloaded
+def on_catalog_changed(name: Optional[str], data: Optional[dict]):
+    if name:
+        invalidate_catalog(name)
+    else:
+        catalog_cache.invalidate()
+
+def on_settings_changed(session_id: Optional[str], data: Optional[dict]):
+    if session_id:
+        settings_cache.pop(session_id)
+    else:
+        settings_cache.clear()
+
+def on_sessions_expired(key: Optional[str], data: Optional[dict]):
+    for session_id in (data or {}).get("session_ids", []):
+        settings_cache.pop(session_id)
+        leaderboard.remove(session_id)
+
+def on_score(session_id: Optional[str], data: Optional[dict]):
+    if session_id:
+        leaderboard.record(session_id, data["points"], data["discoveries"], data["at"])
+    else:
+        spawn(refresh_leaderboard())
+
+def on_session_event(session_id: Optional[str], data: Optional[dict]):
+    if session_id:
+        event_hub.publish(session_id, data["event"], data["data"])
+
+invalidation_bus.subscribe("catalog", on_catalog_changed)
+invalidation_bus.subscribe("settings", on_settings_changed)
+invalidation_bus.subscribe("sessions_expired", on_sessions_expired)
+invalidation_bus.subscribe("leaderboard", on_score)
+invalidation_bus.subscribe("events", on_session_event)
+
+def record_score(session_id: str, points: int = 0, discoveries: int = 0, at: Optional[datetime] = None):
+    """Add to a session's leaderboard score in every worker"""
+    at = at or datetime.utcnow()
+    leaderboard.record(session_id, points, discoveries, at)
+    invalidation_bus.publish("leaderboard", session_id, {"points": points, "discoveries": discoveries, "at": at})
+
+def publish_event(session_id: str, event: str, data: dict):
+    """Push an event to the session's /events streams, whichever worker holds them"""
+    event_hub.publish(session_id, event, data)
+    invalidation_bus.publish("events", session_id, {"event": event, "data": data})
 
 # Startup event
 @app.on_event("startup")
 async def startup_event():
-    await initialize_default_data()
+    await asyncio.gather(ensure_indexes(), invalidation_bus.start())
+    # Seeding is not needed to serve requests, so it does not hold up startup
+    spawn(initialize_default_data())
+    discovery_counter.start()
+    spawn(refresh_leaderboard())
+    spawn(run_periodically(LEADERBOARD_REBUILD_INTERVAL, refresh_leaderboard))
+    spawn(run_periodically(ANALYTICS_ROLLUP_INTERVAL, rollup_discoveries))
+    if SESSION_TTL_DAYS > 0:
+        spawn(run_periodically(SESSION_SWEEP_INTERVAL, expire_idle_sessions))
 
 # Basic routes
 @api_router.get("/")
@@ -227,6 +525,34 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow()}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics"""
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+def catalog_cache_metrics() -> List[str]:
+    stats = catalog_cache.stats()
+    return [
+        "# TYPE catalog_cache_hits_total counter",
+        f"catalog_cache_hits_total {stats['hits']}",
+        "# TYPE catalog_cache_misses_total counter",
+        f"catalog_cache_misses_total {stats['misses']}",
+    ]
+
+def event_hub_metrics() -> List[str]:
+    return [
+        "# TYPE event_stream_connections gauge",
+        f"event_stream_connections {event_hub.connections()}",
+    ]
+
+metrics.registry.collectors.append(catalog_cache_metrics)
+metrics.registry.collectors.append(event_hub_metrics)
+
+@api_router.get("/cache/stats")
+async def cache_stats():
+    """Get catalog and settings cache hit/miss counters"""
+    return {**catalog_cache.stats(), "settings": settings_cache.stats()}
+
 # User Session Management
 @api_router.post("/sessions", response_model=UserSession)
 async def create_session(device_id: str):
@@ -234,121 +560,289 @@ async def create_session(device_id: str):
     session = UserSession(device_id=device_id)
     await db.sessions.insert_one(session.dict())
     
-    # Create initial user progress
-    progress = UserProgress(session_id=session.id, total_checkpoints=5)
-    await db.user_progress.insert_one(progress.dict())
-    
+    # Progress is created by the session's first discovery
     return session
 
 @api_router.get("/sessions/{session_id}", response_model=UserSession)
 async def get_session(session_id: str):
     """Get session details"""
-    session = await db.sessions.find_one({"id": session_id})
+    session = await touch_session(session_id)
+    return UserSession(**session)
+
+async def touch_session(session_id: str) -> dict:
+    """Mark a session as active now, raising 404 if it does not exist"""
+    session = await db.sessions.find_one_and_update(
+        {"id": session_id},
+        {"$set": {"last_active": datetime.utcnow()}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return UserSession(**session)
+    return session
 
 # Plant Management
 @api_router.get("/plants", response_model=List[Plant])
-async def get_plants():
+async def get_plants(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
     """Get all plant species"""
-    plants = await db.plants.find().to_list(100)
-    return [Plant(**plant) for plant in plants]
+    not_modified = await catalog_conditional(request, response, "plants", negotiated=True)
+    if not_modified:
+        return not_modified
+    
+    plants, next_cursor = await catalog_page("plants", Plant, after, limit)
+    set_next_cursor(request, response, next_cursor)
+    if wants_ndjson(request):
+        return ndjson_response(plants, response)
+    return model_response(plants, response)
 
 @api_router.get("/plants/{plant_id}", response_model=Plant)
-async def get_plant(plant_id: str):
+async def get_plant(plant_id: str, request: Request, response: Response):
     """Get specific plant details"""
-    plant = await db.plants.find_one({"id": plant_id})
+    not_modified = await catalog_conditional(request, response, "plants")
+    if not_modified:
+        return not_modified
+    
+    plant = await get_catalog_model("plants", Plant, plant_id)
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
-    return Plant(**plant)
+    return model_response(plant, response)
 
 @api_router.post("/plants", response_model=Plant)
 async def create_plant(plant: PlantCreate):
     """Create a new plant species"""
     new_plant = Plant(**plant.dict())
     await db.plants.insert_one(new_plant.dict())
+    await catalog_changed("plants")
     return new_plant
 
 # Checkpoint Management
-@api_router.get("/checkpoints", response_model=List[CheckpointWithPlant])
-async def get_checkpoints(trail_id: Optional[str] = None, session_id: Optional[str] = None):
-    """Get all checkpoints with plant information"""
+def with_pending_count(checkpoint: dict) -> dict:
+    """Add discoveries not yet flushed to a checkpoint's persisted discovered_count"""
+    return {
+        **checkpoint,
+        "discovered_count": checkpoint.get("discovered_count", 0) + discovery_counter.pending(checkpoint["id"])
+    }
+
+def with_live_count(checkpoint: dict) -> dict:
+    """Replace the catalog cache's discovered_count, which is only as fresh as its last reload"""
+    total = discovery_counter.total(checkpoint["id"])
+    if total is None:
+        return with_pending_count(checkpoint)
+    return {**checkpoint, "discovered_count": total}
+
+# Only what CheckpointWithPlant needs; plants are joined from the catalog cache
+CHECKPOINT_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "position": 1, "plant_id": 1, "color": 1, "trail_id": 1, "discovered_count": 1
+}
+
+def checkpoint_pipeline(query: dict, session_id: Optional[str] = None, limit: Optional[int] = None) -> list:
+    """Build the aggregation that fetches checkpoints with their discovery state"""
+    pipeline = [
+        {"$match": query},
+        {"$sort": {"id": ASCENDING}},
+    ]
+    if limit:
+        pipeline.append({"$limit": limit})
+    pipeline.append({"$project": CHECKPOINT_FIELDS})
+    
+    if session_id:
+        pipeline.extend([
+            {"$lookup": {
+                "from": "user_discoveries",
+                "let": {"checkpoint_id": "$id"},
+                "pipeline": [
+                    {"$match": {"session_id": session_id}},
+                    {"$match": {"$expr": {"$eq": ["$checkpoint_id", "$$checkpoint_id"]}}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 1}}
+                ],
+                "as": "discoveries"
+            }},
+            {"$addFields": {"discovered": {"$gt": [{"$size": "$discoveries"}, 0]}}},
+            {"$project": {"discoveries": 0}},
+        ])
+    
+    return pipeline
+
+async def checkpoint_with_plant(checkpoint: dict, plants: Dict[str, Plant]) -> Optional[CheckpointWithPlant]:
+    """Join a checkpoint with its cached plant model, or None if the plant is missing"""
+    plant = plants.get(checkpoint["plant_id"]) or await get_catalog_model("plants", Plant, checkpoint["plant_id"])
+    if plant is None:
+        return None
+    return CheckpointWithPlant(**with_pending_count(checkpoint), plant=plant)
+
+def checkpoint_query(trail_id: Optional[str], after: Optional[str]) -> dict:
     query = {}
     if trail_id:
         query["trail_id"] = trail_id
+    if after:
+        query["id"] = {"$gt": after}
+    return query
+
+async def list_checkpoints(
+    trail_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = None
+) -> Tuple[List[CheckpointWithPlant], Optional[str]]:
+    """Get a page of checkpoints with plant information and the next cursor"""
+    # One aggregation regardless of how many checkpoints the trail has;
+    # one extra document tells whether another page follows
+    checkpoints = await db.checkpoints.aggregate(
+        checkpoint_pipeline(checkpoint_query(trail_id, after), session_id, limit + 1 if limit else None)
+    ).to_list(None)
     
-    checkpoints = await db.checkpoints.find(query).to_list(100)
-    
-    # Get user discoveries if session_id provided
-    discovered_checkpoints = []
-    if session_id:
-        discoveries = await db.user_discoveries.find({"session_id": session_id}).to_list(100)
-        discovered_checkpoints = [d["checkpoint_id"] for d in discoveries]
+    next_cursor = None
+    if limit and len(checkpoints) > limit:
+        checkpoints = checkpoints[:limit]
+        next_cursor = checkpoints[-1]["id"]
     
-    # Enhance with plant data
+    # Checkpoints whose plant is missing are dropped
+    plants = await get_catalog_models("plants", Plant)
     result = []
     for checkpoint in checkpoints:
-        plant = await db.plants.find_one({"id": checkpoint["plant_id"]})
-        if plant:
-            checkpoint_with_plant = CheckpointWithPlant(
-                **checkpoint,
-                plant=Plant(**plant),
-                discovered=(checkpoint["id"] in discovered_checkpoints)
+        checkpoint = await checkpoint_with_plant(checkpoint, plants)
+        if checkpoint:
+            result.append(checkpoint)
+    return result, next_cursor
+
+@api_router.get("/checkpoints", response_model=List[CheckpointWithPlant])
+async def get_checkpoints(
+    request: Request,
+    response: Response,
+    trail_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get all checkpoints with plant information"""
+    if wants_ndjson(request):
+        # Stream straight from the aggregation cursor
+        cursor = db.checkpoints.aggregate(
+            checkpoint_pipeline(checkpoint_query(trail_id, after), session_id, limit)
+        )
+        plants = await get_catalog_models("plants", Plant)
+        
+        async def checkpoints():
+            async for checkpoint in cursor:
+                checkpoint = await checkpoint_with_plant(checkpoint, plants)
+                if checkpoint:
+                    yield checkpoint
+        
+        return ndjson_response(checkpoints(), response)
+    
+    checkpoints, next_cursor = await list_checkpoints(trail_id, session_id, after, limit)
+    set_next_cursor(request, response, next_cursor)
+    return model_response(checkpoints, response)
+
+@api_router.get("/checkpoints/nearby", response_model=List[NearbyCheckpoint])
+async def get_nearby_checkpoints(
+    x: float,
+    y: float,
+    radius: float = Query(..., gt=0),
+    z: Optional[float] = None,
+    trail_id: Optional[str] = None,
+    session_id: Optional[str] = None,
+    undiscovered_only: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get checkpoints within a radius of a map position, nearest first"""
+    if undiscovered_only and not session_id:
+        raise HTTPException(status_code=400, detail="undiscovered_only requires a session_id")
+    
+    checkpoints = await get_catalog("checkpoints")
+    nearby = checkpoint_index.get(checkpoints).query(x, y, radius, z)
+    
+    if trail_id:
+        nearby = [
+            (checkpoint_id, distance) for checkpoint_id, distance in nearby
+            if (await get_catalog_item("checkpoints", checkpoint_id))["trail_id"] == trail_id
+        ]
+    
+    discovered = set()
+    if session_id and nearby:
+        discovered = {
+            d["checkpoint_id"]
+            async for d in db.user_discoveries.find(
+                {"session_id": session_id, "checkpoint_id": {"$in": [checkpoint_id for checkpoint_id, _ in nearby]}},
+                {"_id": 0, "checkpoint_id": 1}
             )
-            result.append(checkpoint_with_plant)
+        }
+    
+    result = []
+    for checkpoint_id, distance in nearby:
+        if undiscovered_only and checkpoint_id in discovered:
+            continue
+        checkpoint = await get_catalog_item("checkpoints", checkpoint_id)
+        plant = await get_catalog_model("plants", Plant, checkpoint["plant_id"])
+        if not plant:
+            continue
+        result.append(NearbyCheckpoint(
+            **with_live_count(checkpoint),
+            plant=plant,
+            discovered=checkpoint_id in discovered,
+            distance=distance
+        ))
+        if limit and len(result) >= limit:
+            break
     
-    return result
+    return model_response(result)
 
 @api_router.get("/checkpoints/{checkpoint_id}", response_model=CheckpointWithPlant)
 async def get_checkpoint(checkpoint_id: str, session_id: Optional[str] = None):
     """Get specific checkpoint with plant information"""
-    checkpoint = await db.checkpoints.find_one({"id": checkpoint_id})
-    if not checkpoint:
+    checkpoints = await db.checkpoints.aggregate(
+        checkpoint_pipeline({"id": checkpoint_id}, session_id)
+    ).to_list(1)
+    if not checkpoints:
         raise HTTPException(status_code=404, detail="Checkpoint not found")
     
-    plant = await db.plants.find_one({"id": checkpoint["plant_id"]})
-    if not plant:
+    checkpoint = await checkpoint_with_plant(checkpoints[0], await get_catalog_models("plants", Plant))
+    if not checkpoint:
         raise HTTPException(status_code=404, detail="Plant not found")
+    return model_response(checkpoint)
+
+# Discovery System
+async def new_progress(session_id: str) -> UserProgress:
+    """Progress of a session that has not discovered anything yet"""
+    return UserProgress(session_id=session_id, total_checkpoints=len(await get_catalog("checkpoints")))
+
+def discovery_progress_update(records: List[tuple], defaults: UserProgress) -> dict:
+    """Build the user_progress upsert for newly discovered (checkpoint, plant) pairs"""
+    inc = defaultdict(int)
+    inc["plants_collected"] = len(records)
+    for checkpoint, plant in records:
+        inc[f"rarity_counts.{plant['rarity']}"] += 1
+        inc[f"trail_counts.{checkpoint['trail_id']}"] += 1
     
-    # Check if discovered
-    discovered = False
-    if session_id:
-        discovery = await db.user_discoveries.find_one({
-            "session_id": session_id,
-            "checkpoint_id": checkpoint_id
+    return {
+        "$push": {"checkpoints_discovered": {"$each": [checkpoint["id"] for checkpoint, _ in records]}},
+        "$inc": dict(inc),
+        "$set": {"updated_at": datetime.utcnow()},
+        # Creates the progress document on the session's first discovery
+        "$setOnInsert": defaults.dict(exclude={
+            "session_id", "checkpoints_discovered", "plants_collected",
+            "rarity_counts", "trail_counts", "updated_at"
         })
-        discovered = discovery is not None
-    
-    return CheckpointWithPlant(
-        **checkpoint,
-        plant=Plant(**plant),
-        discovered=discovered
-    )
+    }
 
-# Discovery System
 @api_router.post("/discoveries", response_model=DiscoveryResponse)
 async def discover_checkpoint(session_id: str, checkpoint_id: str):
     """Record a plant discovery"""
     
-    # Check if already discovered
-    existing_discovery = await db.user_discoveries.find_one({
-        "session_id": session_id,
-        "checkpoint_id": checkpoint_id
-    })
-    
-    if existing_discovery:
-        return DiscoveryResponse(
-            success=False,
-            message="Already discovered this checkpoint"
-        )
+    await touch_session(session_id)
     
     # Get checkpoint and plant info
-    checkpoint = await db.checkpoints.find_one({"id": checkpoint_id})
+    checkpoint = await get_catalog_item("checkpoints", checkpoint_id)
     if not checkpoint:
         raise HTTPException(status_code=404, detail="Checkpoint not found")
     
-    plant = await db.plants.find_one({"id": checkpoint["plant_id"]})
+    plant = await get_catalog_item("plants", checkpoint["plant_id"])
     if not plant:
         raise HTTPException(status_code=404, detail="Plant not found")
     
@@ -360,29 +854,37 @@ async def discover_checkpoint(session_id: str, checkpoint_id: str):
         location=CheckpointPosition(**checkpoint["position"])
     )
     
-    await db.user_discoveries.insert_one(discovery.dict())
+    # The unique (session_id, checkpoint_id) index rejects repeat discoveries
+    try:
+        await db.user_discoveries.insert_one(discovery.dict())
+    except DuplicateKeyError:
+        return DiscoveryResponse(
+            success=False,
+            message="Already discovered this checkpoint"
+        )
+    record_score(session_id, discoveries=1, at=discovery.discovered_at)
+    publish_discovery(discovery)
     
-    # Update checkpoint discovery count
-    await db.checkpoints.update_one(
-        {"id": checkpoint_id},
-        {"$inc": {"discovered_count": 1}}
-    )
+    # Update checkpoint discovery count (written behind in bulk)
+    discovery_counter.add(checkpoint_id)
     
-    # Update user progress
-    await db.user_progress.update_one(
+    # Update user progress and its counters in one write
+    progress = await db.user_progress.find_one_and_update(
         {"session_id": session_id},
-        {
-            "$push": {"checkpoints_discovered": checkpoint_id},
-            "$inc": {"plants_collected": 1},
-            "$set": {"updated_at": datetime.utcnow()}
-        }
+        discovery_progress_update([(checkpoint, plant)], await new_progress(session_id)),
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
     
-    # Check for achievements
-    achievement_unlocked = await check_achievements(session_id)
-    
-    # Get updated progress
-    progress = await db.user_progress.find_one({"session_id": session_id})
+    achievement_unlocked = None
+    if progress:
+        await update_completed_trails(progress, [checkpoint["trail_id"]])
+        
+        # Check for achievements
+        unlocked = await check_achievements(session_id, progress)
+        achievement_unlocked = unlocked[0] if unlocked else None
+        publish_progress(progress)
     
     return DiscoveryResponse(
         success=True,
@@ -392,85 +894,355 @@ async def discover_checkpoint(session_id: str, checkpoint_id: str):
         progress=UserProgress(**progress) if progress else None
     )
 
-# Achievement System
-async def check_achievements(session_id: str) -> Optional[Achievement]:
-    """Check if user unlocked any achievements"""
+# Live updates
+def publish_discovery(discovery: UserDiscovery):
+    publish_event(discovery.session_id, "discovery", {
+        "checkpoint_id": discovery.checkpoint_id,
+        "plant_id": discovery.plant_id,
+        "discovered_at": discovery.discovered_at
+    })
+
+def publish_progress(progress: dict):
+    publish_event(progress["session_id"], "progress", {
+        "total_discoveries": len(progress["checkpoints_discovered"]),
+        "plants_collected": progress["plants_collected"],
+        "completed_trails": progress.get("completed_trails", []),
+        "achievements_count": len(progress.get("achievements_unlocked", []))
+    })
+
+@api_router.get("/events/{session_id}")
+async def session_events(session_id: str, request: Request):
+    """Stream a session's discoveries, achievement unlocks and progress as Server-Sent Events"""
+    await touch_session(session_id)
+    return StreamingResponse(
+        event_stream(event_hub, session_id, request.is_disconnected),
+        media_type="text/event-stream",
+        # Proxies must not buffer or cache the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/discoveries", response_model=List[UserDiscovery])
+async def get_discoveries(
+    session_id: str,
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
+    """Get a session's discoveries"""
+    query = {"session_id": session_id}
+    if after:
+        query["id"] = {"$gt": after}
     
-    # Get user progress
-    progress = await db.user_progress.find_one({"session_id": session_id})
-    if not progress:
-        return None
+    cursor = db.user_discoveries.find(query, {"_id": 0}).sort("id", ASCENDING)
     
-    # Get user's current achievements
-    user_achievements = await db.user_achievements.find({"session_id": session_id}).to_list(100)
-    unlocked_achievement_ids = [ua["achievement_id"] for ua in user_achievements]
+    if wants_ndjson(request):
+        if limit:
+            cursor = cursor.limit(limit)
+        return ndjson_response((UserDiscovery(**discovery) async for discovery in cursor), response)
     
-    # Get all achievements
-    all_achievements = await db.achievements.find().to_list(100)
+    if limit:
+        cursor = cursor.limit(limit + 1)
+    discoveries = await cursor.to_list(None)
     
-    for achievement_data in all_achievements:
-        achievement = Achievement(**achievement_data)
-        
-        # Skip if already unlocked
-        if achievement.id in unlocked_achievement_ids:
+    next_cursor = None
+    if limit and len(discoveries) > limit:
+        discoveries = discoveries[:limit]
+        next_cursor = discoveries[-1]["id"]
+    set_next_cursor(request, response, next_cursor)
+    
+    return [UserDiscovery(**discovery) for discovery in discoveries]
+
+@api_router.post("/discoveries/batch", response_model=DiscoveryBatchResponse)
+async def discover_checkpoints_batch(session_id: str, events: List[DiscoveryEvent]):
+    """Record a burst of discoveries made while offline"""
+    if len(events) > MAX_DISCOVERY_BATCH:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {MAX_DISCOVERY_BATCH} discoveries can be submitted at once"
+        )
+    
+    await touch_session(session_id)
+    now = datetime.utcnow()
+    results = [None] * len(events)
+    
+    # Resolve events against the catalog, keeping the earliest sighting per checkpoint
+    pending = {}
+    for i, event in enumerate(events):
+        checkpoint = await get_catalog_item("checkpoints", event.checkpoint_id)
+        plant = checkpoint and await get_catalog_item("plants", checkpoint["plant_id"])
+        if not checkpoint or not plant:
+            results[i] = DiscoveryResponse(
+                success=False,
+                message="Checkpoint not found" if not checkpoint else "Plant not found"
+            )
             continue
         
-        # Check conditions
-        condition_met = False
+        # Stored timestamps are naive UTC; devices may send any offset
+        discovered_at = event.discovered_at or now
+        if discovered_at.tzinfo is not None:
+            discovered_at = discovered_at.astimezone(timezone.utc).replace(tzinfo=None)
+        discovered_at = min(discovered_at, now)
+        previous = pending.get(event.checkpoint_id)
+        if previous is None or discovered_at < previous["discovered_at"]:
+            pending[event.checkpoint_id] = {
+                "index": i,
+                "checkpoint": checkpoint,
+                "plant": plant,
+                "discovered_at": discovered_at
+            }
+    
+    # Dedupe against discoveries already recorded for this session
+    existing = {
+        d["checkpoint_id"]
+        async for d in db.user_discoveries.find(
+            {"session_id": session_id, "checkpoint_id": {"$in": list(pending)}},
+            {"_id": 0, "checkpoint_id": 1}
+        )
+    }
+    
+    new = [entry for checkpoint_id, entry in pending.items() if checkpoint_id not in existing]
+    discoveries = [
+        UserDiscovery(
+            session_id=session_id,
+            checkpoint_id=entry["checkpoint"]["id"],
+            plant_id=entry["plant"]["id"],
+            discovered_at=entry["discovered_at"],
+            location=CheckpointPosition(**entry["checkpoint"]["position"])
+        )
+        for entry in new
+    ]
+    
+    if discoveries:
+        try:
+            await db.user_discoveries.insert_many([d.dict() for d in discoveries], ordered=False)
+        except BulkWriteError as e:
+            # Discoveries recorded concurrently still hit the unique index
+            duplicates = {
+                error["index"] for error in e.details["writeErrors"] if error["code"] == 11000
+            }
+            if len(duplicates) != len(e.details["writeErrors"]):
+                raise
+            new = [entry for i, entry in enumerate(new) if i not in duplicates]
+            discoveries = [d for i, d in enumerate(discoveries) if i not in duplicates]
+    
+    for discovery in discoveries:
+        record_score(session_id, discoveries=1, at=discovery.discovered_at)
+        publish_discovery(discovery)
+    
+    progress = None
+    unlocked = []
+    if new:
+        records = [(entry["checkpoint"], entry["plant"]) for entry in new]
+        for checkpoint, _ in records:
+            discovery_counter.add(checkpoint["id"])
         
-        if achievement.condition == "discover_plants":
-            condition_met = progress["plants_collected"] >= achievement.condition_value
-        elif achievement.condition == "discover_rare_plants":
-            # Count rare plants discovered
-            discoveries = await db.user_discoveries.find({"session_id": session_id}).to_list(100)
-            rare_count = 0
-            for discovery in discoveries:
-                plant = await db.plants.find_one({"id": discovery["plant_id"]})
-                if plant and plant["rarity"] == "Rare":
-                    rare_count += 1
-            condition_met = rare_count >= achievement.condition_value
-        elif achievement.condition == "complete_trails":
-            condition_met = len(progress["completed_trails"]) >= achievement.condition_value
+        progress = await db.user_progress.find_one_and_update(
+            {"session_id": session_id},
+            discovery_progress_update(records, await new_progress(session_id)),
+            projection={"_id": 0},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
         
-        if condition_met:
-            # Unlock achievement
-            user_achievement = UserAchievement(
-                session_id=session_id,
-                achievement_id=achievement.id
+        if progress:
+            await update_completed_trails(progress, [checkpoint["trail_id"] for checkpoint, _ in records])
+            unlocked = await check_achievements(session_id, progress)
+            publish_progress(progress)
+    
+    for entry, discovery in zip(new, discoveries):
+        results[entry["index"]] = DiscoveryResponse(
+            success=True,
+            message=f"Discovered {entry['plant']['name']}!",
+            discovery=discovery
+        )
+    
+    for i, result in enumerate(results):
+        if result is None:
+            results[i] = DiscoveryResponse(
+                success=False,
+                message="Already discovered this checkpoint"
             )
+    
+    if progress is None:
+        progress = await db.user_progress.find_one({"session_id": session_id}, {"_id": 0})
+    
+    return DiscoveryBatchResponse(
+        results=results,
+        achievements_unlocked=unlocked,
+        progress=UserProgress(**progress) if progress else None
+    )
+
+# Achievement System
+async def update_completed_trails(progress: dict, trail_ids: List[str]):
+    """Mark trails as completed once every one of their checkpoints is discovered"""
+    completed = []
+    for trail_id in set(trail_ids):
+        if trail_id in progress["completed_trails"]:
+            continue
+        trail = await get_catalog_item("trails", trail_id)
+        if trail and progress.get("trail_counts", {}).get(trail_id, 0) >= len(trail["checkpoint_ids"]):
+            completed.append(trail_id)
+    
+    if completed:
+        await db.user_progress.update_one(
+            {"session_id": progress["session_id"]},
+            {"$addToSet": {"completed_trails": {"$each": completed}}}
+        )
+        progress["completed_trails"].extend(completed)
+
+async def check_achievements(session_id: str, progress: Optional[dict] = None) -> List[Achievement]:
+    """Unlock every achievement whose condition the session's counters now meet"""
+    
+    if progress is None:
+        progress = await db.user_progress.find_one({"session_id": session_id}, {"_id": 0})
+        if not progress:
+            return []
+    
+    # Conditions are evaluated against the counters kept on the progress document
+    candidates = achievement_engine.evaluate(await get_catalog("achievements"), progress)
+    
+    unlocked = []
+    for achievement in candidates:
+        user_achievement = UserAchievement(
+            session_id=session_id,
+            achievement_id=achievement.id
+        )
+        try:
             await db.user_achievements.insert_one(user_achievement.dict())
-            
-            # Update progress
-            await db.user_progress.update_one(
-                {"session_id": session_id},
-                {"$push": {"achievements_unlocked": achievement.id}}
-            )
-            
-            return achievement
+        except DuplicateKeyError:
+            # Unlocked concurrently by another request
+            continue
+        unlocked.append(achievement)
     
-    return None
+    if unlocked:
+        unlocked_ids = [achievement.id for achievement in unlocked]
+        await db.user_progress.update_one(
+            {"session_id": session_id},
+            {"$addToSet": {"achievements_unlocked": {"$each": unlocked_ids}}}
+        )
+        progress["achievements_unlocked"].extend(unlocked_ids)
+        record_score(session_id, points=sum(achievement.points for achievement in unlocked))
+        for achievement in unlocked:
+            publish_event(session_id, "achievement", {
+                "achievement_id": achievement.id,
+                "name": achievement.name,
+                "icon": achievement.icon,
+                "points": achievement.points
+            })
+    
+    return unlocked
 
 @api_router.get("/achievements", response_model=List[Achievement])
-async def get_achievements():
+async def get_achievements(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
     """Get all available achievements"""
-    achievements = await db.achievements.find().to_list(100)
-    return [Achievement(**achievement) for achievement in achievements]
+    not_modified = await catalog_conditional(request, response, "achievements", negotiated=True)
+    if not_modified:
+        return not_modified
+    
+    achievements, next_cursor = await catalog_page("achievements", Achievement, after, limit)
+    set_next_cursor(request, response, next_cursor)
+    if wants_ndjson(request):
+        return ndjson_response(achievements, response)
+    return model_response(achievements, response)
+
+# Leaderboard
+@api_router.get("/leaderboard", response_model=LeaderboardResponse)
+async def get_leaderboard(
+    window: LeaderboardWindow = LeaderboardWindow.ALL_TIME,
+    limit: int = Query(10, ge=1, le=100)
+):
+    """Get the top players by achievement points and discoveries"""
+    board = leaderboard.board(window)
+    entries = [
+        LeaderboardEntry(rank=rank, player=player_tag(session_id), points=points, discoveries=discoveries)
+        for rank, (session_id, points, discoveries) in enumerate(board.top(limit), start=1)
+    ]
+    return LeaderboardResponse(window=window, total_players=len(board), entries=entries)
+
+@api_router.get("/leaderboard/{session_id}", response_model=LeaderboardEntry)
+async def get_leaderboard_rank(session_id: str, window: LeaderboardWindow = LeaderboardWindow.ALL_TIME):
+    """Get a session's own rank"""
+    ranking = leaderboard.board(window).rank(session_id)
+    if ranking is None:
+        raise HTTPException(status_code=404, detail="No score for this session")
+    rank, points, discoveries = ranking
+    return LeaderboardEntry(rank=rank, player=player_tag(session_id), points=points, discoveries=discoveries)
+
+# Analytics
+def analytics_range(since: Optional[datetime], until: Optional[datetime]) -> Tuple[datetime, datetime]:
+    until = until or datetime.utcnow()
+    return since or until - timedelta(days=ANALYTICS_DEFAULT_DAYS), until
+
+@api_router.get("/analytics/heatmap", response_model=DiscoveryHeatmap)
+async def get_discovery_heatmap(
+    group: AnalyticsGroup = AnalyticsGroup.CHECKPOINT,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Get discoveries by weekday and hour of day per checkpoint or plant"""
+    since, until = analytics_range(since, until)
+    frame = await analytics.load_rollups(db, since, until)
+    return DiscoveryHeatmap(
+        group=group, since=since, until=until,
+        cells=analytics.heatmaps(frame, f"{group.value}_id")
+    )
+
+@api_router.get("/analytics/timeseries", response_model=DiscoveryTimeseries)
+async def get_discovery_timeseries(
+    group: AnalyticsGroup = AnalyticsGroup.CHECKPOINT,
+    bucket: AnalyticsBucket = AnalyticsBucket.DAY,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None
+):
+    """Get discoveries per hour or day per checkpoint or plant"""
+    since, until = analytics_range(since, until)
+    frame = await analytics.load_rollups(db, since, until)
+    series = analytics.timeseries(frame, f"{group.value}_id", "h" if bucket == AnalyticsBucket.HOUR else "D")
+    return DiscoveryTimeseries(
+        group=group, bucket=bucket, since=since, until=until,
+        series={
+            key: [DiscoveryCount(at=at, count=count) for at, count in counts]
+            for key, counts in series.items()
+        }
+    )
+
+@api_router.get("/analytics/funnel/{trail_id}", response_model=TrailFunnel)
+async def get_trail_funnel(trail_id: str):
+    """Get discoveries per checkpoint in trail order, with drop-off between them"""
+    trail = await get_catalog_item("trails", trail_id)
+    if not trail:
+        raise HTTPException(status_code=404, detail="Trail not found")
+    
+    steps = []
+    for checkpoint_id, discoveries, drop_off in await analytics.trail_funnel(db, trail_id, trail["checkpoint_ids"]):
+        checkpoint = await get_catalog_item("checkpoints", checkpoint_id)
+        steps.append(FunnelStep(
+            checkpoint_id=checkpoint_id,
+            name=checkpoint["name"] if checkpoint else checkpoint_id,
+            discoveries=discoveries,
+            drop_off=drop_off
+        ))
+    return TrailFunnel(trail_id=trail_id, steps=steps)
 
 @api_router.get("/progress/{session_id}", response_model=ProgressSummary)
 async def get_progress(session_id: str):
     """Get user progress summary"""
     progress = await db.user_progress.find_one({"session_id": session_id})
     if not progress:
-        raise HTTPException(status_code=404, detail="Progress not found")
+        # Sessions without discoveries have no progress document yet
+        if not await db.sessions.find_one({"id": session_id}, {"_id": 1}):
+            raise HTTPException(status_code=404, detail="Progress not found")
+        progress = (await new_progress(session_id)).dict()
     
-    # Get discoveries for rarity breakdown
-    discoveries = await db.user_discoveries.find({"session_id": session_id}).to_list(100)
-    rarity_breakdown = {"Common": 0, "Uncommon": 0, "Rare": 0, "Legendary": 0}
-    
-    for discovery in discoveries:
-        plant = await db.plants.find_one({"id": discovery["plant_id"]})
-        if plant:
-            rarity_breakdown[plant["rarity"]] += 1
+    # Rarity counters are maintained on the progress document by each discovery
+    rarity_counts = progress.get("rarity_counts", {})
+    rarity_breakdown = {rarity.value: rarity_counts.get(rarity.value, 0) for rarity in PlantRarity}
     
     return ProgressSummary(
         session_id=session_id,
@@ -486,20 +1258,219 @@ async def get_progress(session_id: str):
 
 # Trail Management
 @api_router.get("/trails", response_model=List[Trail])
-async def get_trails():
+async def get_trails(
+    request: Request,
+    response: Response,
+    after: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE)
+):
     """Get all trails"""
-    trails = await db.trails.find().to_list(100)
-    return [Trail(**trail) for trail in trails]
+    not_modified = await catalog_conditional(request, response, "trails", negotiated=True)
+    if not_modified:
+        return not_modified
+    
+    trails, next_cursor = await catalog_page("trails", Trail, after, limit)
+    set_next_cursor(request, response, next_cursor)
+    if wants_ndjson(request):
+        return ndjson_response(trails, response)
+    return model_response(trails, response)
 
 @api_router.get("/trails/{trail_id}", response_model=Trail)
-async def get_trail(trail_id: str):
+async def get_trail(trail_id: str, request: Request, response: Response):
     """Get specific trail details"""
-    trail = await db.trails.find_one({"id": trail_id})
+    not_modified = await catalog_conditional(request, response, "trails")
+    if not_modified:
+        return not_modified
+    
+    trail = await get_catalog_model("trails", Trail, trail_id)
     if not trail:
         raise HTTPException(status_code=404, detail="Trail not found")
-    return Trail(**trail)
+    return model_response(trail, response)
+
+@api_router.get("/trails/{trail_id}/route", response_model=TrailRoute)
+async def get_trail_route(
+    trail_id: str,
+    session_id: Optional[str] = None,
+    x: Optional[float] = None,
+    y: Optional[float] = None
+):
+    """Get a short order in which to visit a trail's checkpoints"""
+    if (x is None) != (y is None):
+        raise HTTPException(status_code=400, detail="x and y must be given together")
+    
+    # Read first, so the cached route is never keyed on catalogs older than the trail
+    catalogs = (await get_catalog("checkpoints"), await get_catalog("trails"))
+    trail = await get_catalog_item("trails", trail_id)
+    if not trail:
+        raise HTTPException(status_code=404, detail="Trail not found")
+    
+    async def trail_route():
+        # The full trail route starts at the trail's first listed checkpoint
+        trail_checkpoints = [
+            checkpoint for checkpoint in
+            [await get_catalog_item("checkpoints", checkpoint_id) for checkpoint_id in trail["checkpoint_ids"]]
+            if checkpoint
+        ]
+        points = [(c["position"]["x"], c["position"]["y"]) for c in trail_checkpoints]
+        order, length = await asyncio.to_thread(plan_route, points)
+        return [trail_checkpoints[i]["id"] for i in order], length
+    
+    checkpoint_ids, total_distance = await route_cache.get_or_compute(catalogs, trail_id, trail_route)
+    if session_id is None and x is None:
+        return TrailRoute(trail_id=trail_id, checkpoint_ids=checkpoint_ids, total_distance=total_distance)
+    
+    if session_id:
+        discovered = {
+            d["checkpoint_id"]
+            async for d in db.user_discoveries.find(
+                {"session_id": session_id, "checkpoint_id": {"$in": checkpoint_ids}},
+                {"_id": 0, "checkpoint_id": 1}
+            )
+        }
+        checkpoint_ids = [checkpoint_id for checkpoint_id in checkpoint_ids if checkpoint_id not in discovered]
+    
+    # Refine the cached order for this visitor, seeded so it stays interactive
+    points = []
+    for checkpoint_id in checkpoint_ids:
+        position = (await get_catalog_item("checkpoints", checkpoint_id))["position"]
+        points.append((position["x"], position["y"]))
+    order, total_distance = await asyncio.to_thread(
+        plan_route,
+        points,
+        (x, y) if x is not None else None,
+        range(len(points)),
+        0.2
+    )
+    
+    return TrailRoute(
+        trail_id=trail_id,
+        checkpoint_ids=[checkpoint_ids[i] for i in order],
+        total_distance=total_distance
+    )
 
 # Map Image Management
+def map_image_url(trail_id: str) -> str:
+    return f"{api_router.prefix}/maps/{trail_id}/image"
+
+async def read_upload(file: UploadFile):
+    """Yield an upload in fixed-size chunks instead of reading it whole"""
+    while True:
+        chunk = await file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+async def migrate_legacy_map(map_image: dict) -> Optional[dict]:
+    """Move a map stored as base64 in its document into the blob store"""
+    content = base64.b64decode(map_image["image_data"])
+    
+    async def chunks():
+        yield content
+    
+    blob = await blob_store.put(chunks(), map_image["name"], map_image["image_type"])
+    update = {
+        **blob.dict(),
+        "image_url": map_image_url(map_image["trail_id"])
+    }
+    # Only one of several concurrent readers gets to migrate the map
+    result = await db.maps.update_one(
+        {"id": map_image["id"], "blob_id": {"$exists": False}},
+        {"$set": update, "$unset": {"image_data": ""}}
+    )
+    if result.modified_count == 0:
+        await blob_store.delete(blob.blob_id)
+        return await db.maps.find_one({"id": map_image["id"]}, {"_id": 0})
+    
+    map_image.pop("image_data")
+    map_image.update(update)
+    await catalog_changed("maps")
+    
+    spawn(generate_map_tiles(map_image))
+    return map_image
+
+async def generate_map_tiles(map_image: dict):
+    """Build the deep-zoom tile pyramid of a map once and store it in map_tiles"""
+    map_id = map_image["id"]
+    try:
+        await db.map_tiles.delete_many({"map_id": map_id})
+        
+        content = await blob_store.read(map_image["blob_id"])
+        level = await asyncio.to_thread(tiles.open_image, content)
+        del content
+        
+        width, height = level.size
+        max_zoom = tiles.max_zoom_for(width, height)
+        _, tile_type = tiles.tile_format(level)
+        
+        # Render from full resolution down, halving the image for each level
+        for z in range(max_zoom, -1, -1):
+            for y in range(tiles.row_count(level)):
+                row = await asyncio.to_thread(tiles.render_row, level, y)
+                await db.map_tiles.insert_many([
+                    {"map_id": map_id, "z": z, "x": x, "y": y, "data": data}
+                    for x, data in row
+                ])
+            if z > 0:
+                level = await asyncio.to_thread(tiles.reduce_level, level)
+        
+        map_tiles = MapTiles(
+            tile_size=tiles.TILE_SIZE,
+            max_zoom=max_zoom,
+            width=width,
+            height=height,
+            image_type=tile_type,
+            tile_url=f"{api_router.prefix}/maps/{map_image['trail_id']}/tiles/{{z}}/{{x}}/{{y}}"
+        )
+        result = await db.maps.update_one({"id": map_id}, {"$set": {"tiles": map_tiles.dict()}})
+        if result.matched_count == 0:
+            # The map was replaced while its tiles were being generated
+            await db.map_tiles.delete_many({"map_id": map_id})
+            return
+        await catalog_changed("maps")
+        
+        logger.info(f"Generated {max_zoom + 1} tile levels for map of trail {map_image['trail_id']}")
+    except Exception:
+        logger.exception(f"Tile generation failed for map {map_id}")
+
+async def find_map(trail_id: str) -> Optional[dict]:
+    map_image = await db.maps.find_one({"trail_id": trail_id}, {"_id": 0})
+    if map_image and "blob_id" not in map_image:
+        map_image = await migrate_legacy_map(map_image)
+    return map_image
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+def parse_range(range_header: str, size: int) -> Optional[tuple]:
+    """Parse a single-range ``bytes=`` header into inclusive (start, end).
+    
+    Returns None for headers that are to be ignored (other units, several
+    ranges, invalid syntax), so the whole representation is sent, and raises
+    RangeNotSatisfiable when the range lies outside the content.
+    """
+    unit, _, spec = range_header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    
+    start, _, end = spec.strip().partition("-")
+    try:
+        if start:
+            start, end = int(start), (int(end) if end else max(int(start), size - 1))
+        else:
+            # Suffix range: the last N bytes
+            suffix = int(end)
+            if suffix == 0:
+                raise RangeNotSatisfiable()
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    
+    if start < 0 or start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size - 1)
+
 @api_router.post("/maps", response_model=MapImage)
 async def upload_map(
     name: str = Form(...),
@@ -508,39 +1479,154 @@ async def upload_map(
 ):
     """Upload a map image"""
     
-    # Read and encode image
-    content = await file.read()
-    image_data = base64.b64encode(content).decode('utf-8')
+    # Tiles are rendered from the decoded image, so oversize maps are refused
+    # from their header before anything is stored
+    if file.size is not None and file.size > tiles.MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Map files are limited to {tiles.MAX_UPLOAD_BYTES} bytes")
+    try:
+        await asyncio.to_thread(tiles.image_size, file.file)
+    except tiles.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnidentifiedImageError:
+        raise HTTPException(status_code=400, detail="Map file is not a supported image")
+    await file.seek(0)
+    
+    # Stream the upload into the blob store chunk by chunk
+    blob = await blob_store.put(read_upload(file), file.filename or name, file.content_type)
     
     map_image = MapImage(
         name=name,
-        image_data=image_data,
         image_type=file.content_type,
-        trail_id=trail_id
+        trail_id=trail_id,
+        image_url=map_image_url(trail_id),
+        **blob.dict()
+    )
+    
+    # A trail has one map; replace the previous one and release its blob
+    previous = await db.maps.find_one_and_replace(
+        {"trail_id": trail_id},
+        map_image.dict(),
+        upsert=True
     )
+    if previous:
+        await db.map_tiles.delete_many({"map_id": previous["id"]})
+        if previous.get("blob_id"):
+            await blob_store.delete(previous["blob_id"])
+    
+    await catalog_changed("maps")
+    
+    # Tiles are rendered outside the request so the render neither holds an
+    # admission slot nor counts towards the upload's latency
+    spawn(generate_map_tiles(map_image.dict()))
     
-    await db.maps.insert_one(map_image.dict())
     return map_image
 
 @api_router.get("/maps/{trail_id}", response_model=Optional[MapImage])
-async def get_map(trail_id: str):
-    """Get map image for a trail"""
-    map_image = await db.maps.find_one({"trail_id": trail_id})
+async def get_map(trail_id: str, request: Request, response: Response):
+    """Get map image metadata for a trail"""
+    not_modified = await catalog_conditional(request, response, "maps")
+    if not_modified:
+        return not_modified
+    
+    map_image = await find_map(trail_id)
     if not map_image:
         return None
     return MapImage(**map_image)
 
+@api_router.get("/maps/{trail_id}/image")
+async def get_map_image(trail_id: str, request: Request):
+    """Download the map image for a trail, with Range and ETag support"""
+    map_image = await find_map(trail_id)
+    if not map_image:
+        raise HTTPException(status_code=404, detail="Map not found")
+    
+    size = map_image["size"]
+    headers = {
+        "ETag": f'"{map_image["etag"]}"',
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "public, max-age=86400"
+    }
+    
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    start, end, status_code = 0, size - 1, 200
+    range_header = request.headers.get("range")
+    # Ranges only apply while the client still holds the current version
+    if_range = request.headers.get("if-range")
+    if range_header and size and (not if_range or if_range == headers["ETag"]):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    
+    headers["Content-Length"] = str(end - start + 1 if size else 0)
+    
+    async def body():
+        try:
+            async for chunk in blob_store.stream(map_image["blob_id"], start, end):
+                yield chunk
+        except BlobNotFound:
+            logger.error(f"Blob {map_image['blob_id']} missing for map of trail {trail_id}")
+    
+    return StreamingResponse(
+        body(),
+        status_code=status_code,
+        media_type=map_image["image_type"],
+        headers=headers
+    )
+
+@api_router.get("/maps/{trail_id}/tiles/{z}/{x}/{y}")
+async def get_map_tile(trail_id: str, z: int, x: int, y: int, request: Request):
+    """Get a single tile of a map's deep-zoom pyramid"""
+    map_image = await db.maps.find_one({"trail_id": trail_id}, {"_id": 0, "id": 1, "etag": 1, "tiles": 1})
+    if not map_image or not map_image.get("tiles"):
+        raise HTTPException(status_code=404, detail="Map tiles not found")
+    
+    headers = {
+        "ETag": f'"{map_image["etag"]}-{z}-{x}-{y}"',
+        "Cache-Control": "public, max-age=86400"
+    }
+    if etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    
+    tile = await db.map_tiles.find_one({"map_id": map_image["id"], "z": z, "x": x, "y": y})
+    if not tile:
+        raise HTTPException(status_code=404, detail="Tile not found")
+    
+    return Response(
+        content=bytes(tile["data"]),
+        media_type=map_image["tiles"]["image_type"],
+        headers=headers
+    )
+
 # Settings Management
 @api_router.get("/settings/{session_id}", response_model=ARSettings)
 async def get_settings(session_id: str):
     """Get AR settings for a session"""
-    settings = await db.settings.find_one({"session_id": session_id})
-    if not settings:
-        # Create default settings
-        default_settings = ARSettings(session_id=session_id)
-        await db.settings.insert_one(default_settings.dict())
-        return default_settings
-    return ARSettings(**settings)
+    settings = settings_cache.get(session_id)
+    if settings is not None:
+        return settings
+    
+    # Read, or create with defaults, in a single round trip
+    token = settings_cache.reserve(session_id)
+    defaults = ARSettings(session_id=session_id).dict(exclude={"session_id"})
+    document = await db.settings.find_one_and_update(
+        {"session_id": session_id},
+        {"$setOnInsert": defaults},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    settings = ARSettings(**document)
+    # An update that landed while reading has already cached something newer
+    settings_cache.put_reserved(session_id, settings, token)
+    return settings
 
 @api_router.put("/settings/{session_id}", response_model=ARSettings)
 async def update_settings(session_id: str, settings_update: ARSettingsUpdate):
@@ -548,20 +1634,72 @@ async def update_settings(session_id: str, settings_update: ARSettingsUpdate):
     update_data = {k: v for k, v in settings_update.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.settings.update_one(
+    # Fields not being updated get their defaults if the settings are new
+    defaults = ARSettings(session_id=session_id).dict(exclude={"session_id", *update_data})
+    document = await db.settings.find_one_and_update(
         {"session_id": session_id},
-        {"$set": update_data},
-        upsert=True
+        {"$set": update_data, "$setOnInsert": defaults},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    
+    settings = ARSettings(**document)
+    settings_cache.put(session_id, settings)
+    invalidation_bus.publish("settings", session_id)
+    return settings
+
+# App Launch
+@api_router.get("/bootstrap/{session_id}", response_model=BootstrapResponse)
+async def bootstrap(session_id: str, trail_id: Optional[str] = None):
+    """Get everything the app needs on launch in a single round trip"""
+    
+    async def progress_or_none():
+        try:
+            return await get_progress(session_id)
+        except HTTPException:
+            return None
+    
+    async def load_trails():
+        return list((await get_catalog_models("trails", Trail)).values())
+    
+    async def load_achievements():
+        return list((await get_catalog_models("achievements", Achievement)).values())
+    
+    async def map_or_none():
+        map_image = await find_map(trail_id) if trail_id else None
+        return MapImage(**map_image) if map_image else None
+    
+    # The individual lookups are independent, so run them concurrently
+    session, trails, (checkpoints, _), achievements, settings, progress, map_image = await asyncio.gather(
+        get_session(session_id),
+        load_trails(),
+        list_checkpoints(trail_id=trail_id, session_id=session_id),
+        load_achievements(),
+        get_settings(session_id),
+        progress_or_none(),
+        map_or_none()
     )
     
-    settings = await db.settings.find_one({"session_id": session_id})
-    return ARSettings(**settings)
+    return model_response(BootstrapResponse(
+        session=session,
+        trails=trails,
+        checkpoints=checkpoints,
+        achievements=achievements,
+        settings=settings,
+        progress=progress,
+        map=map_image
+    ))
 
 # Include the router in the main app
 app.include_router(api_router)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in list(background_tasks):
+        task.cancel()
+    await discovery_counter.stop()
+    await invalidation_bus.stop()
     client.close()
 
 if __name__ == "__main__":
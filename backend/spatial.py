@@ -0,0 +1,87 @@
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+
+class GridIndex:
+    """Uniform grid over checkpoint positions for radius queries.
+
+    Points are bucketed into square cells; a query only inspects the cells
+    overlapping the search circle's bounding box, so its cost depends on how
+    many markers are nearby rather than on the size of the park.
+    """
+
+    def __init__(self, checkpoints: List[dict], cell_size: Optional[float] = None):
+        self.points = [
+            (c["id"], float(c["position"]["x"]), float(c["position"]["y"]), float(c["position"].get("z") or 0))
+            for c in checkpoints
+        ]
+        self.cell_size = cell_size or self._default_cell_size()
+        self.cells: Dict[Tuple[int, int], list] = defaultdict(list)
+        for point in self.points:
+            self.cells[self._cell(point[1], point[2])].append(point)
+
+    def _default_cell_size(self) -> float:
+        # Aim for roughly one marker per cell on an evenly covered map
+        if len(self.points) < 2:
+            return 1.0
+        xs = [p[1] for p in self.points]
+        ys = [p[2] for p in self.points]
+        width, height = max(xs) - min(xs), max(ys) - min(ys)
+        longest = max(width, height)
+        if longest <= 0:
+            return 1.0
+        # Markers strung along a line would get near-zero square cells from the
+        # area; spread them along the longer side instead
+        if min(width, height) < longest / len(self.points):
+            return longest / len(self.points)
+        return math.sqrt(width * height / len(self.points))
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def query(self, x: float, y: float, radius: float, z: Optional[float] = None) -> List[Tuple[str, float]]:
+        """Return (checkpoint_id, distance) pairs within ``radius``, nearest first.
+
+        Distance is measured on the map plane unless ``z`` is given.
+        """
+        min_cx, min_cy = self._cell(x - radius, y - radius)
+        max_cx, max_cy = self._cell(x + radius, y + radius)
+
+        # A huge radius would visit more empty cells than there are points
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self.cells):
+            candidates = self.points
+        else:
+            candidates = [
+                point
+                for cx in range(min_cx, max_cx + 1)
+                for cy in range(min_cy, max_cy + 1)
+                for point in self.cells.get((cx, cy), ())
+            ]
+
+        radius_sq = radius * radius
+        results = []
+        for checkpoint_id, px, py, pz in candidates:
+            distance_sq = (px - x) ** 2 + (py - y) ** 2
+            if z is not None:
+                distance_sq += (pz - z) ** 2
+            if distance_sq <= radius_sq:
+                results.append((checkpoint_id, math.sqrt(distance_sq)))
+
+        results.sort(key=lambda result: result[1])
+        return results
+
+
+class SpatialIndexCache:
+    """Keeps a GridIndex in sync with the cached checkpoint catalog"""
+
+    def __init__(self):
+        self._source = None
+        self._index: Optional[GridIndex] = None
+
+    def get(self, checkpoints: List[dict]) -> GridIndex:
+        # The catalog cache hands out a new list whenever checkpoints are reloaded
+        if checkpoints is not self._source:
+            self._index = GridIndex(checkpoints)
+            self._source = checkpoints
+        return self._index
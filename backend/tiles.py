@@ -0,0 +1,83 @@
+import io
+import math
+import os
+from typing import BinaryIO, List, Tuple
+
+from PIL import Image
+
+TILE_SIZE = 256
+
+# Decoded maps are held in memory whole, at up to 4 bytes per pixel, so the
+# pixel count bounds what a single upload can make a worker allocate
+MAX_PIXELS = int(os.environ.get("MAP_MAX_PIXELS", 100_000_000))
+MAX_UPLOAD_BYTES = int(os.environ.get("MAP_MAX_UPLOAD_BYTES", 50 * 1024 * 1024))
+Image.MAX_IMAGE_PIXELS = MAX_PIXELS
+
+
+class ImageTooLarge(ValueError):
+    pass
+
+
+def open_lazily(fp: BinaryIO) -> Image.Image:
+    """Open an image reading only its header, rejecting it if it has too many pixels"""
+    try:
+        image = Image.open(fp)
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e)) from e
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageTooLarge(f"Map is {width}x{height} pixels, at most {MAX_PIXELS} pixels are allowed")
+    return image
+
+
+def image_size(fp: BinaryIO) -> Tuple[int, int]:
+    """Dimensions of an image, checked without decoding it"""
+    return open_lazily(fp).size
+
+
+def open_image(content: bytes) -> Image.Image:
+    image = open_lazily(io.BytesIO(content))
+    image.load()
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+    return image
+
+
+def max_zoom_for(width: int, height: int, tile_size: int = TILE_SIZE) -> int:
+    """Zoom level at which the image is shown at full resolution; level 0 fits in one tile"""
+    return max(0, math.ceil(math.log2(max(width, height) / tile_size)))
+
+
+def tile_format(image: Image.Image) -> Tuple[str, str]:
+    """Pick the tile encoding: JPEG for opaque maps, PNG when transparency matters"""
+    if image.mode == "RGBA":
+        return "PNG", "image/png"
+    return "JPEG", "image/jpeg"
+
+
+def reduce_level(image: Image.Image) -> Image.Image:
+    """Halve an image to produce the next zoom level down"""
+    if image.width < 2 or image.height < 2:
+        return image.resize((max(1, image.width // 2), max(1, image.height // 2)), Image.LANCZOS)
+    return image.reduce(2)
+
+
+def render_row(image: Image.Image, y: int, tile_size: int = TILE_SIZE) -> List[Tuple[int, bytes]]:
+    """Encode one row of tiles of a zoom level as (x, bytes) pairs"""
+    fmt, _ = tile_format(image)
+    columns = math.ceil(image.width / tile_size)
+    tiles = []
+    for x in range(columns):
+        box = (x * tile_size, y * tile_size,
+               min((x + 1) * tile_size, image.width), min((y + 1) * tile_size, image.height))
+        buffer = io.BytesIO()
+        if fmt == "JPEG":
+            image.crop(box).save(buffer, fmt, quality=85, optimize=True)
+        else:
+            image.crop(box).save(buffer, fmt, optimize=True)
+        tiles.append((x, buffer.getvalue()))
+    return tiles
+
+
+def row_count(image: Image.Image, tile_size: int = TILE_SIZE) -> int:
+    return math.ceil(image.height / tile_size)
@@ -0,0 +1,304 @@
+"""Load generation and latency benchmark for the AR Adventure API.
+
+Drives concurrent virtual visitors through the journey a real visitor makes
+(session -> bootstrap -> discoveries -> progress), reusing the endpoint
+definitions of ``ARAdventureTestClient`` from backend_test.py, and reports
+p50/p95/p99 latency and throughput per endpoint.
+
+    # Against a running server (BACKEND_URL or /app/frontend/.env)
+    python backend_bench.py --visitors 50 --journeys 4
+
+    # In-process: the ASGI app is called directly, backed by MONGO_URL
+    python backend_bench.py --in-process --output bench.json --baseline previous.json
+
+    # Per-request CPU time of response serialization only, no server or Mongo
+    python backend_bench.py --serialization --items 200
+
+All virtual visitors share one client address, so a server under test should
+be started with RATE_LIMIT_SESSION_ADDRESSES=0 (see backend/admission.py);
+in-process runs lift that ceiling themselves unless it is set explicitly.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from backend_test import ARAdventureTestClient, resolve_api_url
+
+# Ids in paths are replaced so requests group by route
+ID_PATTERN = re.compile(r"/([0-9a-f]{8}-[0-9a-f-]{27}|[a-z]+_\d+)(?=/|$)")
+
+
+def route_label(method: str, endpoint: str) -> str:
+    path = endpoint.split("?", 1)[0]
+    return f"{method} {ID_PATTERN.sub('/{id}', path)}"
+
+
+class LatencyRecorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, label: str, seconds: float, ok: bool):
+        self.samples[label].append(seconds)
+        if not ok:
+            self.errors[label] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        def stats(samples: List[float], errors: int) -> Dict[str, Any]:
+            ordered = sorted(samples)
+
+            def percentile(p: float) -> float:
+                return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+            return {
+                "count": len(ordered),
+                "errors": errors,
+                "throughput_rps": len(ordered) / elapsed if elapsed else 0.0,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": percentile(50),
+                "p95_ms": percentile(95),
+                "p99_ms": percentile(99),
+                "max_ms": ordered[-1] * 1000,
+            }
+
+        endpoints = {
+            label: stats(samples, self.errors[label])
+            for label, samples in sorted(self.samples.items())
+        }
+        all_samples = [s for samples in self.samples.values() for s in samples]
+        return {
+            "elapsed_s": elapsed,
+            "overall": stats(all_samples, sum(self.errors.values())) if all_samples else {},
+            "endpoints": endpoints,
+        }
+
+
+class AsyncVisitor(ARAdventureTestClient):
+    """ARAdventureTestClient whose requests go through a shared httpx.AsyncClient.
+
+    Every endpoint method of the base client returns ``_make_request(...)``
+    directly, so overriding it with a coroutine makes them awaitable.
+    """
+
+    def __init__(self, http: httpx.AsyncClient, recorder: LatencyRecorder):
+        super().__init__(base_url="/api")
+        self.http = http
+        self.recorder = recorder
+
+    async def _make_request(self, method: str, endpoint: str, params: Dict[str, Any] = None,
+                            data: Dict[str, Any] = None, json_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            response = await self.http.request(method, f"{self.base_url}{endpoint}", params=params,
+                                               data=data, json=json_data)
+            ok = 200 <= response.status_code < 300
+        except httpx.HTTPError:
+            response, ok = None, False
+        self.recorder.record(route_label(method, endpoint), time.perf_counter() - start, ok)
+
+        if response is None:
+            return {"status_code": None, "data": None, "success": False}
+        try:
+            payload = response.json() if response.content else None
+        except json.JSONDecodeError:
+            payload = response.text
+        return {"status_code": response.status_code, "data": payload, "success": ok}
+
+    async def create_session(self) -> Dict[str, Any]:
+        response = await self._make_request("POST", f"/sessions?device_id={self.device_id}")
+        if response["success"]:
+            self.session_id = response["data"]["id"]
+        return response
+
+
+async def visitor_journey(visitor: AsyncVisitor, trail_id: Optional[str], discoveries: int, think_time: float):
+    """One visit: open the app, walk the trail discovering checkpoints, check progress"""
+    session = await visitor.create_session()
+    if not session["success"]:
+        return
+
+    bootstrap = await visitor.get_bootstrap(trail_id)
+    if not bootstrap["success"]:
+        return
+
+    checkpoints = [c["id"] for c in bootstrap["data"]["checkpoints"]]
+    random.shuffle(checkpoints)
+    for checkpoint_id in checkpoints[:discoveries]:
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time))
+        await visitor.discover_checkpoint(checkpoint_id)
+        await visitor.get_checkpoints(trail_id)
+
+    await visitor.get_progress()
+
+
+async def run_load(http: httpx.AsyncClient, args) -> Dict[str, Any]:
+    recorder = LatencyRecorder()
+
+    async def virtual_visitor():
+        for _ in range(args.journeys):
+            await visitor_journey(AsyncVisitor(http, recorder), args.trail_id, args.discoveries, args.think_time)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[virtual_visitor() for _ in range(args.visitors)])
+    return recorder.summary(time.perf_counter() - start)
+
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.visitors)
+    if args.in_process:
+        os.environ.setdefault("RATE_LIMIT_SESSION_ADDRESSES", "0")
+        from backend.server import app
+
+        # ASGITransport does not run lifespan events, so start the app by hand
+        await app.router.startup()
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as http:
+                return await run_load(http, args)
+        finally:
+            await app.router.shutdown()
+
+    base_url = args.url or resolve_api_url()
+    # AsyncVisitor prefixes every path with /api
+    base_url = base_url[:-len("/api")] if base_url.endswith("/api") else base_url
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as http:
+        return await run_load(http, args)
+
+
+def serialization_benchmark(items: int, rounds: int) -> Dict[str, Any]:
+    """Per-request CPU time of rendering a checkpoint listing through FastAPI's
+    ``response_model`` handling versus the orjson ``ModelResponse`` path"""
+    from fastapi.responses import JSONResponse
+    from fastapi.routing import serialize_response
+    from fastapi.utils import create_response_field
+
+    from backend.models import CheckpointWithPlant, Plant
+    from backend.responses import ModelResponse
+
+    plant = Plant(
+        name="Blue Lotus", scientific_name="Nymphaea caerulea", description="A water lily " * 20,
+        facts=["Opens in the morning", "Closes at noon", "Sacred in ancient Egypt"],
+        rarity="Rare", habitat="Ponds", conservation_status="Least Concern"
+    )
+    docs = [
+        {
+            "id": f"checkpoint_{i}", "name": f"Checkpoint {i}",
+            "position": {"x": random.uniform(0, 100), "y": random.uniform(0, 100), "z": 0},
+            "plant_id": plant.id, "color": "#4CAF50", "trail_id": "trail_1",
+            "discovered_count": i, "discovered": i % 2 == 0
+        }
+        for i in range(items)
+    ]
+    field = create_response_field(name="response", type_=List[CheckpointWithPlant])
+
+    async def response_model_path() -> bytes:
+        # Plant joined as a raw document, models validated again against response_model
+        models = [CheckpointWithPlant(**doc, plant=plant.model_dump()) for doc in docs]
+        return JSONResponse(await serialize_response(field=field, response_content=models)).body
+
+    async def model_response_path() -> bytes:
+        # Cached plant model, models rendered directly with orjson
+        models = [CheckpointWithPlant(**doc, plant=plant) for doc in docs]
+        return ModelResponse(models).body
+
+    loop = asyncio.new_event_loop()
+    try:
+        before, after = loop.run_until_complete(response_model_path()), loop.run_until_complete(model_response_path())
+        if json.loads(before) != json.loads(after):
+            raise AssertionError("ModelResponse output differs from the response_model path")
+
+        results = {}
+        for name, path in (("response_model", response_model_path), ("model_response", model_response_path)):
+            start = time.process_time()
+            for _ in range(rounds):
+                loop.run_until_complete(path())
+            results[name] = {"cpu_ms_per_request": (time.process_time() - start) / rounds * 1000}
+    finally:
+        loop.close()
+
+    results["speedup"] = results["response_model"]["cpu_ms_per_request"] / results["model_response"]["cpu_ms_per_request"]
+    return {"items": items, "rounds": rounds, "bytes": len(after), "serialization": results}
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Print per-endpoint p95 changes against a previous result file"""
+    print(f"\n{'endpoint':45} {'p95 before':>11} {'p95 after':>11} {'change':>8}")
+    for label, stats in current["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(label)
+        if not before:
+            print(f"{label:45} {'-':>11} {stats['p95_ms']:>9.1f}ms {'new':>8}")
+            continue
+        change = (stats["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100 if before["p95_ms"] else 0.0
+        print(f"{label:45} {before['p95_ms']:>9.1f}ms {stats['p95_ms']:>9.1f}ms {change:>+7.1f}%")
+
+
+def print_summary(summary: Dict[str, Any]):
+    print(f"\n{'endpoint':45} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, stats in summary["endpoints"].items():
+        print(f"{label:45} {stats['count']:>7} {stats['errors']:>5} {stats['throughput_rps']:>8.1f} "
+              f"{stats['p50_ms']:>6.1f}ms {stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms")
+    overall = summary["overall"]
+    if overall:
+        print(f"\n{overall['count']} requests in {summary['elapsed_s']:.1f}s "
+              f"({overall['throughput_rps']:.1f} req/s, {overall['errors']} errors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="API base URL (defaults to BACKEND_URL or /app/frontend/.env)")
+    parser.add_argument("--in-process", action="store_true", help="call the ASGI app directly instead of over HTTP")
+    parser.add_argument("--visitors", type=int, default=20, help="concurrent virtual visitors")
+    parser.add_argument("--journeys", type=int, default=3, help="journeys per virtual visitor")
+    parser.add_argument("--discoveries", type=int, default=5, help="checkpoints discovered per journey")
+    parser.add_argument("--trail-id", default="trail_1")
+    parser.add_argument("--think-time", type=float, default=0.0, help="max random pause between discoveries (s)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="previous JSON results to diff against")
+    parser.add_argument("--serialization", action="store_true",
+                        help="only measure per-request CPU time of response serialization")
+    parser.add_argument("--items", type=int, default=200, help="checkpoints per response (--serialization)")
+    parser.add_argument("--rounds", type=int, default=200, help="requests measured per path (--serialization)")
+    args = parser.parse_args()
+
+    if args.serialization:
+        summary = serialization_benchmark(args.items, args.rounds)
+        results = summary["serialization"]
+        print(f"{summary['items']} checkpoints, {summary['bytes']} bytes per response")
+        for name in ("response_model", "model_response"):
+            print(f"{name:16} {results[name]['cpu_ms_per_request']:>8.3f} ms CPU per request")
+        print(f"{'speedup':16} {results['speedup']:>8.2f}x")
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(summary, f, indent=2)
+        return
+
+    started_at = datetime.utcnow().isoformat()
+    summary = asyncio.run(run(args))
+    summary["started_at"] = started_at
+    summary["config"] = {
+        key: value for key, value in vars(args).items() if key not in ("output", "baseline")
+    }
+
+    print_summary(summary)
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(summary, json.load(f))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,24 @@
+import os
 import requests
 import json
 import uuid
 import time
 from typing import Dict, Any, List, Optional
 
-# Get the backend URL from the frontend .env file
-with open('/app/frontend/.env', 'r') as f:
-    for line in f:
-        if line.startswith('REACT_APP_BACKEND_URL='):
-            BACKEND_URL = line.strip().split('=')[1].strip('"\'')
-            break
 
-# Ensure the URL doesn't have quotes
-if BACKEND_URL.startswith('"') and BACKEND_URL.endswith('"'):
-    BACKEND_URL = BACKEND_URL[1:-1]
-elif BACKEND_URL.startswith("'") and BACKEND_URL.endswith("'"):
-    BACKEND_URL = BACKEND_URL[1:-1]
-
-API_URL = f"{BACKEND_URL}/api"
-print(f"Using API URL: {API_URL}")
+def resolve_api_url() -> str:
+    """Get the API URL from BACKEND_URL or, failing that, the frontend .env file"""
+    backend_url = os.environ.get("BACKEND_URL")
+    if not backend_url:
+        with open('/app/frontend/.env', 'r') as f:
+            for line in f:
+                if line.startswith('REACT_APP_BACKEND_URL='):
+                    backend_url = line.strip().split('=', 1)[1]
+                    break
+    
+    # Ensure the URL doesn't have quotes
+    backend_url = backend_url.strip().strip('"\'')
+    return f"{backend_url}/api"
 
 class ARAdventureTestClient:
     def __init__(self, base_url: str):
@@ -91,6 +91,14 @@ class ARAdventureTestClient:
             f"/discoveries?session_id={self.session_id}&checkpoint_id={checkpoint_id}"
         )
     
+    def discover_batch(self, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._make_request(
+            "POST",
+            "/discoveries/batch",
+            params={"session_id": self.session_id},
+            json_data=events
+        )
+    
     def get_achievements(self) -> Dict[str, Any]:
         return self._make_request("GET", "/achievements")
     
@@ -103,6 +111,10 @@ class ARAdventureTestClient:
     def get_trail(self, trail_id: str) -> Dict[str, Any]:
         return self._make_request("GET", f"/trails/{trail_id}")
     
+    def get_bootstrap(self, trail_id: Optional[str] = None) -> Dict[str, Any]:
+        params = {"trail_id": trail_id} if trail_id else None
+        return self._make_request("GET", f"/bootstrap/{self.session_id}", params=params)
+    
     def get_settings(self) -> Dict[str, Any]:
         return self._make_request("GET", f"/settings/{self.session_id}")
     
@@ -115,7 +127,9 @@ def run_tests():
     print("AR Adventure Backend API Tests")
     print("=" * 80)
     
-    client = ARAdventureTestClient(API_URL)
+    api_url = resolve_api_url()
+    print(f"Using API URL: {api_url}")
+    client = ARAdventureTestClient(api_url)
     
     # Test 1: Health Check
     print("\n1. Testing Health Check...")
@@ -308,6 +322,41 @@ def run_tests():
     assert settings_response_2["data"]["render_quality"] == "medium", "Render quality setting not persisted"
     print("✅ Settings persistence verified")
     
+    # Test 10: Offline Discovery Batches
+    print("\n10. Testing Offline Discovery Batches...")
+    batch_client = ARAdventureTestClient(api_url)
+    assert batch_client.create_session()["success"], "Batch session creation failed"
+    first, second, third = (checkpoint["id"] for checkpoint in checkpoints_response["data"][:3])
+    assert batch_client.discover_checkpoint(first)["data"]["success"], "Initial discovery failed"
+    
+    # 10.1 Zoned timestamps, a checkpoint sighted twice and one already discovered
+    print("  10.1 Submitting a mixed batch...")
+    batch_response = batch_client.discover_batch([
+        {"checkpoint_id": second, "discovered_at": "2026-01-10T03:00:00.000Z"},
+        {"checkpoint_id": second, "discovered_at": "2026-01-10T04:30:00+02:00"},
+        {"checkpoint_id": first, "discovered_at": "2026-01-10T01:00:00Z"},
+        {"checkpoint_id": third},
+    ])
+    assert batch_response["success"], f"Batch discovery failed: {batch_response}"
+    results = batch_response["data"]["results"]
+    assert len(results) == 4, f"Expected one result per event, got {len(results)}"
+    assert [r["success"] for r in results] == [False, True, False, True], f"Unexpected batch results: {results}"
+    assert results[1]["discovery"]["discovered_at"].startswith("2026-01-10T02:30:00"), \
+        f"Earliest sighting not kept in UTC: {results[1]['discovery']['discovered_at']}"
+    assert "Already discovered" in results[2]["message"], "Expected 'Already discovered' message"
+    batch_progress = batch_response["data"]["progress"]
+    assert len(batch_progress["checkpoints_discovered"]) == 3, \
+        f"Expected 3 discoveries, got {batch_progress['checkpoints_discovered']}"
+    assert batch_progress["plants_collected"] == 3, \
+        f"Expected 3 plants collected, got {batch_progress['plants_collected']}"
+    print("✅ Batch discoveries deduplicated and timestamps normalized to UTC")
+    
+    # 10.2 Oversize batches are refused outright
+    print("  10.2 Submitting an oversize batch...")
+    oversize_response = batch_client.discover_batch([{"checkpoint_id": third}] * 10000)
+    assert oversize_response["status_code"] == 413, f"Expected 413, got {oversize_response['status_code']}"
+    print("✅ Oversize batch rejected")
+    
     print("\n" + "=" * 80)
     print("All tests completed successfully!")
     print("=" * 80)
@@ -319,7 +368,8 @@ def run_tests():
         "discovery_system": True,
         "progress_tracking": True,
         "trail_management": True,
-        "settings_management": True
+        "settings_management": True,
+        "discovery_batches": True
     }
 
 if __name__ == "__main__":
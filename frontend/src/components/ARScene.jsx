@@ -4,7 +4,7 @@ import { Button } from './ui/button';
 import { Badge } from './ui/badge';
 import { X, Camera, Info, Leaf, TreePine, Flower2, Scan, MapPin, Trophy, Loader2 } from 'lucide-react';
 import { useSession } from '../hooks/useSession';
-import { getCheckpoints, discoverCheckpoint, getProgress } from '../services/api';
+import { getBootstrap, discoverCheckpoint } from '../services/api';
 import { toast } from 'sonner';
 
 const ARScene = () => {
@@ -23,8 +23,7 @@ const ARScene = () => {
 
   useEffect(() => {
     if (session) {
-      loadCheckpoints();
-      loadProgress();
+      loadInitialData();
     }
   }, [session]);
 
@@ -34,11 +33,12 @@ const ARScene = () => {
     }
   }, [arStarted]);
 
-  const loadCheckpoints = async () => {
+  const loadInitialData = async () => {
     try {
       setLoading(true);
-      const data = await getCheckpoints('trail_1', session?.id);
-      setCheckpoints(data);
+      const data = await getBootstrap(session.id, 'trail_1');
+      setCheckpoints(data.checkpoints);
+      setProgress(data.progress);
     } catch (error) {
       console.error('Error loading checkpoints:', error);
       toast.error('Failed to load checkpoints');
@@ -47,15 +47,6 @@ const ARScene = () => {
     }
   };
 
-  const loadProgress = async () => {
-    try {
-      const progressData = await getProgress(session.id);
-      setProgress(progressData);
-    } catch (error) {
-      console.error('Error loading progress:', error);
-    }
-  };
-
   const startCamera = async () => {
     try {
       const stream = await navigator.mediaDevices.getUserMedia({
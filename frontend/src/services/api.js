@@ -75,6 +75,19 @@ export const getCheckpoint = async (checkpointId, sessionId = null) => {
   }
 };
 
+export const getNearbyCheckpoints = async (position, radius, sessionId = null, options = {}) => {
+  try {
+    const params = { x: position.x, y: position.y, radius, ...options };
+    if (sessionId) params.session_id = sessionId;
+    
+    const response = await axios.get(`${API}/checkpoints/nearby`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching nearby checkpoints:', error);
+    throw error;
+  }
+};
+
 // Discovery System
 export const discoverCheckpoint = async (sessionId, checkpointId) => {
   try {
@@ -91,6 +104,19 @@ export const discoverCheckpoint = async (sessionId, checkpointId) => {
   }
 };
 
+// Submit discoveries queued while offline in a single request
+export const discoverCheckpointsBatch = async (sessionId, events) => {
+  try {
+    const response = await axios.post(`${API}/discoveries/batch`, events, {
+      params: { session_id: sessionId }
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Error syncing discoveries:', error);
+    throw error;
+  }
+};
+
 // Achievement System
 export const getAchievements = async () => {
   try {
@@ -113,6 +139,39 @@ export const getProgress = async (sessionId) => {
   }
 };
 
+// Live updates (Server-Sent Events); returns a function that closes the stream
+export const subscribeToSessionEvents = (sessionId, handlers = {}) => {
+  const source = new EventSource(`${API}/events/${sessionId}`);
+  ['discovery', 'achievement', 'progress'].forEach((type) => {
+    if (handlers[type]) {
+      source.addEventListener(type, (event) => handlers[type](JSON.parse(event.data)));
+    }
+  });
+  source.onerror = (error) => console.error('Session event stream error:', error);
+  return () => source.close();
+};
+
+// Leaderboard
+export const getLeaderboard = async (window = 'all_time', limit = 10) => {
+  try {
+    const response = await axios.get(`${API}/leaderboard`, { params: { window, limit } });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching leaderboard:', error);
+    throw error;
+  }
+};
+
+export const getLeaderboardRank = async (sessionId, window = 'all_time') => {
+  try {
+    const response = await axios.get(`${API}/leaderboard/${sessionId}`, { params: { window } });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching leaderboard rank:', error);
+    throw error;
+  }
+};
+
 // Trail Management
 export const getTrails = async () => {
   try {
@@ -134,6 +193,23 @@ export const getTrail = async (trailId) => {
   }
 };
 
+export const getTrailRoute = async (trailId, sessionId = null, position = null) => {
+  try {
+    const params = {};
+    if (sessionId) params.session_id = sessionId;
+    if (position) {
+      params.x = position.x;
+      params.y = position.y;
+    }
+    
+    const response = await axios.get(`${API}/trails/${trailId}/route`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error fetching trail route:', error);
+    throw error;
+  }
+};
+
 // Map Management
 export const uploadMap = async (name, trailId, file) => {
   try {
@@ -164,6 +240,16 @@ export const getMap = async (trailId) => {
   }
 };
 
+// Binary map image URL, served with Range and ETag support
+export const getMapImageUrl = (map) => `${BACKEND_URL}${map.image_url}`;
+
+// Tile URL for the visible viewport once map.tiles is available
+export const getMapTileUrl = (map, z, x, y) =>
+  `${BACKEND_URL}${map.tiles.tile_url}`
+    .replace('{z}', z)
+    .replace('{x}', x)
+    .replace('{y}', y);
+
 // Settings Management
 export const getSettings = async (sessionId) => {
   try {
@@ -185,6 +271,20 @@ export const updateSettings = async (sessionId, settings) => {
   }
 };
 
+// App launch: session, catalog, progress, settings and map in one request
+export const getBootstrap = async (sessionId, trailId = null) => {
+  try {
+    const params = {};
+    if (trailId) params.trail_id = trailId;
+    
+    const response = await axios.get(`${API}/bootstrap/${sessionId}`, { params });
+    return response.data;
+  } catch (error) {
+    console.error('Error bootstrapping app:', error);
+    throw error;
+  }
+};
+
 // Helper function to generate device ID
 export const generateDeviceId = () => {
   return `device_${Date.now()}_${Math.random().toString(36).substring(2, 15)}`;
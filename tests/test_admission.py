@@ -0,0 +1,48 @@
+import asyncio
+
+from backend.admission import AdmissionMiddleware, limits_from_env
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def request(middleware, method, path, query="", client="10.0.0.1"):
+    statuses = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": query.encode(), "client": (client, 1)}
+    asyncio.run(middleware(scope, None, send))
+    return statuses[0]
+
+
+def test_limits_from_env():
+    limits = limits_from_env({"RATE_LIMIT_SESSION_ADDRESSES": "0", "RATE_LIMIT_SESSIONS": "1,50"})
+    assert "session_addresses" not in limits
+    assert limits["sessions"] == (1.0, 50.0)
+    assert limits["writes"] == limits_from_env({})["writes"]
+
+
+def test_sessions_are_limited_per_device():
+    middleware = AdmissionMiddleware(ok_app, limits={"sessions": (0.001, 2), "session_addresses": (0.001, 100)})
+    assert [request(middleware, "POST", "/api/sessions", "device_id=a") for _ in range(3)] == [200, 200, 429]
+    # Other visitors behind the same address are unaffected
+    assert request(middleware, "POST", "/api/sessions", "device_id=b") == 200
+
+
+def test_address_ceiling_bounds_fresh_device_ids():
+    middleware = AdmissionMiddleware(ok_app, limits={"sessions": (0.001, 2), "session_addresses": (0.001, 5)})
+    statuses = [request(middleware, "POST", "/api/sessions", f"device_id=d{i}") for i in range(8)]
+    assert statuses == [200] * 5 + [429] * 3
+    assert request(middleware, "POST", "/api/sessions", "device_id=x", client="10.0.0.2") == 200
+
+
+def test_settings_writes_are_keyed_by_path_session():
+    middleware = AdmissionMiddleware(ok_app, limits={"writes": (0.001, 1)})
+    assert request(middleware, "PUT", "/api/settings/s1") == 200
+    assert request(middleware, "PUT", "/api/settings/s1") == 429
+    assert request(middleware, "PUT", "/api/settings/s2") == 200
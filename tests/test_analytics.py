@@ -0,0 +1,16 @@
+import numpy as np
+
+from backend.analytics import drop_offs
+
+
+def test_drop_off_is_relative_to_previous_step():
+    assert drop_offs(np.array([10, 5, 4])).tolist() == [0.0, 0.5, 0.2]
+
+
+def test_more_popular_later_step_has_no_drop_off():
+    assert drop_offs(np.array([5, 10, 0])).tolist() == [0.0, 0.0, 1.0]
+
+
+def test_empty_and_unvisited_steps():
+    assert drop_offs(np.array([], dtype=np.int64)).tolist() == []
+    assert drop_offs(np.array([0, 0, 3])).tolist() == [0.0, 0.0, 0.0]
@@ -0,0 +1,67 @@
+import asyncio
+
+from backend.cache import CatalogCache, LRUCache
+
+
+def test_loads_once_and_caches():
+    cache = CatalogCache(ttl=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        return ["plant"]
+
+    async def main():
+        assert await cache.get("plants", loader) == ["plant"]
+        assert await cache.get("plants", loader) == ["plant"]
+
+    asyncio.run(main())
+    assert len(loads) == 1
+
+
+def test_invalidation_during_load_is_not_lost():
+    for invalidate_all in (False, True):
+        cache = CatalogCache(ttl=60)
+        catalog = ["old"]
+
+        async def main():
+            loading = asyncio.Event()
+            release = asyncio.Event()
+
+            async def slow_loader():
+                value = list(catalog)
+                loading.set()
+                await release.wait()
+                return value
+
+            task = asyncio.create_task(cache.get("plants", slow_loader))
+            await loading.wait()
+            # A write lands while the stale read is in flight
+            catalog[:] = ["new"]
+            cache.invalidate() if invalidate_all else cache.invalidate("plants")
+            release.set()
+            assert await task == ["old"]
+
+            async def loader():
+                return list(catalog)
+
+            assert await cache.get("plants", loader) == ["new"]
+
+        asyncio.run(main())
+
+
+def test_reserved_read_does_not_replace_newer_write():
+    cache = LRUCache(maxsize=10)
+    token = cache.reserve("s")
+    cache.put("s", "updated")
+    assert not cache.put_reserved("s", "stale", token)
+    assert cache.get("s") == "updated"
+
+    token = cache.reserve("s")
+    cache.pop("s")
+    assert not cache.put_reserved("s", "stale", token)
+    assert cache.get("s") is None
+
+    token = cache.reserve("s")
+    assert cache.put_reserved("s", "fresh", token)
+    assert cache.get("s") == "fresh"
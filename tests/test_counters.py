@@ -0,0 +1,72 @@
+import asyncio
+
+from backend.counters import CounterBuffer
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for CounterBuffer"""
+
+    def __init__(self, docs):
+        self.docs = {doc["id"]: dict(doc) for doc in docs}
+        self.finds = 0
+
+    def find(self, query, projection):
+        self.finds += 1
+        docs = [dict(doc) for doc in self.docs.values()]
+
+        async def cursor():
+            for doc in docs:
+                yield doc
+
+        return cursor()
+
+    async def bulk_write(self, requests, ordered=True):
+        for request in requests:
+            doc = self.docs[request._filter["id"]]
+            for field, amount in request._doc["$inc"].items():
+                doc[field] = doc.get(field, 0) + amount
+
+
+def test_total_includes_pending_and_flushed_increments():
+    collection = FakeCollection([{"id": "a", "discovered_count": 5}, {"id": "b"}])
+    counter = CounterBuffer(collection, "discovered_count", refresh_interval=60)
+
+    async def main():
+        assert counter.total("a") is None
+        await counter.refresh()
+        assert counter.total("a") == 5
+        assert counter.total("b") == 0
+
+        counter.add("a", 2)
+        assert counter.total("a") == 7
+        await counter.flush()
+        assert collection.docs["a"]["discovered_count"] == 7
+        # Counted once, from the local tally rather than another read
+        assert counter.total("a") == 7
+        assert collection.finds == 1
+
+        # Another worker's flush shows up on the next refresh
+        collection.docs["b"]["discovered_count"] = 3
+        await counter.refresh()
+        assert counter.total("b") == 3
+        assert counter.total("a") == 7
+
+    asyncio.run(main())
+
+
+def test_failed_flush_stays_pending():
+    collection = FakeCollection([{"id": "a", "discovered_count": 1}])
+    counter = CounterBuffer(collection, "discovered_count")
+
+    async def failing_bulk_write(requests, ordered=True):
+        raise RuntimeError("down")
+
+    async def main():
+        await counter.refresh()
+        counter.add("a")
+        collection.bulk_write = failing_bulk_write
+        await counter.flush()
+        assert counter.pending("a") == 1
+        assert counter.total("a") == 2
+
+    asyncio.run(main())
@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+from backend.leaderboard import Leaderboard, RankedScores, window_start
+from backend.models import LeaderboardWindow
+
+
+def test_ranked_by_points_then_discoveries_then_session():
+    board = RankedScores()
+    board.add("c", points=10, discoveries=1)
+    board.add("a", points=10, discoveries=1)
+    board.add("b", points=10, discoveries=3)
+    board.add("d", points=20)
+    board.add("e", discoveries=50)
+
+    assert [session_id for session_id, _, _ in board.top(10)] == ["d", "b", "a", "c", "e"]
+    assert board.rank("d") == (1, 20, 0)
+    assert board.rank("a") == (3, 10, 1)
+    assert board.rank("c") == (4, 10, 1)
+    assert board.rank("missing") is None
+
+
+def test_scores_accumulate_and_rerank():
+    board = RankedScores()
+    board.add("a", points=5)
+    board.add("b", points=10)
+    assert board.rank("a")[0] == 2
+
+    board.add("a", points=6, discoveries=2)
+    assert board.rank("a") == (1, 11, 2)
+    assert board.rank("b")[0] == 2
+    assert len(board) == 2
+
+
+def test_remove():
+    board = RankedScores()
+    for i in range(5):
+        board.add(f"s{i}", points=i)
+    board.remove("s4")
+    board.remove("missing")
+    assert len(board) == 4
+    assert board.rank("s4") is None
+    assert board.top(1) == [("s3", 3, 0)]
+
+
+def test_top_is_limited():
+    board = RankedScores()
+    for i in range(100):
+        board.add(f"s{i:03d}", discoveries=i)
+    assert [discoveries for _, _, discoveries in board.top(3)] == [99, 98, 97]
+
+
+def test_window_start():
+    now = datetime(2026, 10, 17, 15, 30)  # a Saturday
+    assert window_start(LeaderboardWindow.ALL_TIME, now) is None
+    assert window_start(LeaderboardWindow.DAILY, now) == datetime(2026, 10, 17)
+    assert window_start(LeaderboardWindow.WEEKLY, now) == datetime(2026, 10, 12)
+
+
+def test_old_scores_only_count_in_longer_windows():
+    leaderboard = Leaderboard()
+    now = datetime.utcnow()
+    leaderboard.record("a", discoveries=1, at=now)
+    leaderboard.record("b", discoveries=1, at=now - timedelta(days=8))
+
+    assert leaderboard.board(LeaderboardWindow.DAILY).rank("a") is not None
+    assert leaderboard.board(LeaderboardWindow.DAILY).rank("b") is None
+    assert leaderboard.board(LeaderboardWindow.WEEKLY).rank("b") is None
+    # Tied on score, "a" sorts before "b"
+    assert leaderboard.board(LeaderboardWindow.ALL_TIME).rank("b") == (2, 0, 1)
+
+
+def test_ended_window_starts_over():
+    leaderboard = Leaderboard()
+    leaderboard.record("a", points=5)
+
+    # As if the board had been filled during the previous day and week
+    for window in (LeaderboardWindow.DAILY, LeaderboardWindow.WEEKLY):
+        leaderboard.starts[window] -= timedelta(days=7)
+
+    assert len(leaderboard.board(LeaderboardWindow.DAILY)) == 0
+    assert len(leaderboard.board(LeaderboardWindow.WEEKLY)) == 0
+    assert leaderboard.board(LeaderboardWindow.ALL_TIME).rank("a") == (1, 5, 0)
+    assert leaderboard.starts[LeaderboardWindow.DAILY] == window_start(LeaderboardWindow.DAILY, datetime.utcnow())
+
+    leaderboard.record("b", discoveries=1)
+    assert leaderboard.board(LeaderboardWindow.DAILY).top(10) == [("b", 0, 1)]
@@ -0,0 +1,95 @@
+import asyncio
+import random
+
+import numpy as np
+import pytest
+
+from backend.routing import RouteCache, distance_matrix, nearest_neighbour, plan_route, route_length, two_opt
+
+
+def random_points(n, seed=3):
+    rng = random.Random(seed)
+    return [(rng.uniform(0, 1000), rng.uniform(0, 1000)) for _ in range(n)]
+
+
+def walk_length(points, order, start=None):
+    stops = ([start] if start else []) + [points[i] for i in order]
+    return sum(np.hypot(b[0] - a[0], b[1] - a[1]) for a, b in zip(stops, stops[1:]))
+
+
+def test_order_is_a_permutation():
+    points = random_points(60)
+    order, _ = plan_route(points)
+    assert sorted(order) == list(range(len(points)))
+
+
+def test_first_point_starts_the_route():
+    points = random_points(40)
+    order, _ = plan_route(points)
+    assert order[0] == 0
+
+
+def test_start_position_is_respected():
+    points = random_points(40)
+    start = (2000.0, 2000.0)
+    order, length = plan_route(points, start=start)
+    assert sorted(order) == list(range(len(points)))
+    # The reported length includes the leg from the start position
+    assert length == pytest.approx(walk_length(points, order, start), rel=1e-4)
+    # Greedy from the start, the first stop is the point closest to it
+    closest = min(range(len(points)), key=lambda i: np.hypot(points[i][0] - start[0], points[i][1] - start[1]))
+    nn_order, nn_length = plan_route(points, start=start, time_budget=0)
+    assert nn_order[0] == closest
+    assert length <= nn_length + 1e-3
+
+
+def test_never_longer_than_nearest_neighbour():
+    for seed in range(5):
+        points = random_points(80, seed)
+        dist = distance_matrix(np.asarray(points))
+        greedy = nearest_neighbour(dist, 0)
+        improved = two_opt(greedy, dist)
+        assert improved[0] == 0
+        assert sorted(improved.tolist()) == list(range(len(points)))
+        assert route_length(improved, dist) <= route_length(greedy, dist) + 1e-3
+
+
+def test_small_inputs():
+    assert plan_route([]) == ([], 0.0)
+    assert plan_route([(1.0, 1.0)]) == ([0], 0.0)
+    order, length = plan_route([(0.0, 0.0), (3.0, 4.0)])
+    assert order == [0, 1]
+    assert abs(length - 5.0) < 1e-4
+
+
+def test_concurrent_requests_compute_once():
+    cache = RouteCache()
+    catalogs = ([{"id": "a"}], [{"id": "trail"}])
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return ["a"], 0.0
+
+    async def main():
+        routes = await asyncio.gather(*[cache.get_or_compute(catalogs, "trail", compute) for _ in range(10)])
+        assert all(route == (["a"], 0.0) for route in routes)
+        # Served from the cache afterwards
+        assert await cache.get_or_compute(catalogs, "trail", compute) == (["a"], 0.0)
+
+    asyncio.run(main())
+    assert len(calls) == 1
+
+
+def test_catalog_reload_drops_routes():
+    checkpoints, trails = [{"id": "a"}], [{"id": "trail"}]
+    for reloaded in (([{"id": "a"}], trails), (checkpoints, [{"id": "trail"}])):
+        cache = RouteCache()
+        cache.get((checkpoints, trails), "trail")
+        cache.set((checkpoints, trails), "trail", (["a"], 0.0))
+        assert cache.get((checkpoints, trails), "trail") == (["a"], 0.0)
+        assert cache.get(reloaded, "trail") is None
+        # A route computed against the previous catalogs is not stored
+        cache.set((checkpoints, trails), "trail", (["a"], 0.0))
+        assert cache.get(reloaded, "trail") is None
@@ -0,0 +1,53 @@
+import math
+import random
+
+from backend.spatial import GridIndex
+
+
+def checkpoint(i, x, y, z=0.0):
+    return {"id": f"cp-{i}", "position": {"x": x, "y": y, "z": z}}
+
+
+def brute_force(checkpoints, x, y, radius):
+    results = []
+    for c in checkpoints:
+        distance = math.sqrt((c["position"]["x"] - x) ** 2 + (c["position"]["y"] - y) ** 2)
+        if distance <= radius:
+            results.append((c["id"], distance))
+    return sorted(results, key=lambda result: result[1])
+
+
+def test_query_matches_brute_force():
+    rng = random.Random(7)
+    checkpoints = [checkpoint(i, rng.uniform(-500, 500), rng.uniform(-500, 500)) for i in range(2000)]
+    index = GridIndex(checkpoints)
+    for _ in range(50):
+        x, y, radius = rng.uniform(-600, 600), rng.uniform(-600, 600), rng.uniform(1, 200)
+        assert index.query(x, y, radius) == brute_force(checkpoints, x, y, radius)
+
+
+def test_results_are_nearest_first():
+    index = GridIndex([checkpoint(0, 5, 0), checkpoint(1, 1, 0), checkpoint(2, 3, 0)])
+    assert [checkpoint_id for checkpoint_id, _ in index.query(0, 0, 10)] == ["cp-1", "cp-2", "cp-0"]
+
+
+def test_z_only_counts_when_given():
+    index = GridIndex([checkpoint(0, 3, 0, z=4)])
+    assert index.query(0, 0, 3) == [("cp-0", 3.0)]
+    assert index.query(0, 0, 3, z=0) == []
+    assert index.query(0, 0, 5, z=0) == [("cp-0", 5.0)]
+
+
+def test_collinear_points_get_usable_cells():
+    checkpoints = [checkpoint(i, i * 10.0, 0.0) for i in range(10000)]
+    index = GridIndex(checkpoints)
+    # About one marker per cell along the line rather than a degenerate grid
+    assert index.cell_size >= 9.0
+    assert len(index.cells) <= len(checkpoints)
+    assert index.query(500, 0, 15) == brute_force(checkpoints, 500, 0, 15)
+
+
+def test_coincident_points():
+    index = GridIndex([checkpoint(0, 2, 2), checkpoint(1, 2, 2)])
+    assert index.cell_size == 1.0
+    assert {checkpoint_id for checkpoint_id, _ in index.query(2, 2, 0.5)} == {"cp-0", "cp-1"}